@@ -7,6 +7,11 @@ while ! pg_isready -h $DB_HOST -p $DB_PORT -U $DB_USER; do
 done
 echo "Database ready!"
 
+# Run a one-off command (e.g. the session scheduler) instead of the server
+if [ "$#" -gt 0 ]; then
+  exec "$@"
+fi
+
 # Run migrations
 echo "Running migrations..."
 python manage.py makemigrations
@@ -31,5 +36,21 @@ else:
 EOF
 
 # Start server
-echo "Starting server..."
-python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+# SERVER_MODE: dev (runserver), wsgi or asgi (gunicorn, see gunicorn.conf.py)
+SERVER_MODE=${SERVER_MODE:-dev}
+echo "Starting server ($SERVER_MODE)..."
+case "$SERVER_MODE" in
+  wsgi)
+    export SERVER_MODE
+    exec gunicorn -c gunicorn.conf.py
+    ;;
+  asgi)
+    # Sync code runs in a new thread per request under ASGI, so persistent
+    # connections would pile up instead of being reused
+    export SERVER_MODE DB_CONN_MAX_AGE=${DB_CONN_MAX_AGE:-0}
+    exec gunicorn -c gunicorn.conf.py
+    ;;
+  *)
+    exec python manage.py runserver 0.0.0.0:8000
+    ;;
+esac
\ No newline at end of file
@@ -0,0 +1,33 @@
+# Gunicorn settings for the production serving modes (see entrypoint.sh).
+# Every value can be overridden with the environment variable next to it.
+import multiprocessing
+import os
+
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+cores = multiprocessing.cpu_count()
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+if SERVER_MODE == "asgi":
+    # Event-loop workers: one per core is enough to saturate the CPU
+    wsgi_app = "voting_system.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+    workers = int(os.getenv("WEB_CONCURRENCY", cores))
+else:
+    # Threaded workers overlap database waits; the usual 2 * cores + 1
+    wsgi_app = "voting_system.wsgi:application"
+    worker_class = "gthread"
+    workers = int(os.getenv("WEB_CONCURRENCY", 2 * cores + 1))
+    threads = int(os.getenv("WEB_THREADS", 4))
+
+# Keep-alive connections from the frontend and load balancers
+keepalive = int(os.getenv("WEB_KEEPALIVE", 5))
+timeout = int(os.getenv("WEB_TIMEOUT", 30))
+# SIGHUP and deploys let in-flight requests finish for this long
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("WEB_MAX_REQUESTS_JITTER", 1000))
+
+accesslog = "-"
+errorlog = "-"
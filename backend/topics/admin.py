@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.db.models import Sum
+from .cache import invalidate_topic
 from .models import Topic
 
 
@@ -7,7 +9,14 @@ class TopicAdmin(admin.ModelAdmin):
     list_display = ("title", "status", "created_by", "created_at", "is_session_active")
     list_filter = ("status", "created_at")
     search_fields = ("title", "description")
-    readonly_fields = ("created_at", "updated_at", "is_session_active")
+    readonly_fields = (
+        "created_at",
+        "updated_at",
+        "is_session_active",
+        "yes_votes",
+        "no_votes",
+        "total_votes",
+    )
 
     fieldsets = (
         ("Informações Básicas", {"fields": ("title", "description", "created_by")}),
@@ -22,8 +31,51 @@ class TopicAdmin(admin.ModelAdmin):
                 )
             },
         ),
+        (
+            "Apuração",
+            {"fields": ("yes_votes", "no_votes", "total_votes", "tally_shards")},
+        ),
         (
             "Timestamps",
             {"fields": ("created_at", "updated_at"), "classes": ("collapse",)},
         ),
     )
+
+    def tally(self, obj):
+        if obj.pk is None:
+            return {}
+        if not hasattr(obj, "_tally"):
+            snapshot = getattr(obj, "result_snapshot", None)
+            if snapshot is not None:
+                # Final result of a closed topic (votes.ResultSnapshot)
+                obj._tally = {"YES": snapshot.yes_votes, "NO": snapshot.no_votes}
+            else:
+                # Sum of the topic's counter shards (votes.TallyShard)
+                obj._tally = dict(
+                    obj.tally_counters.values("choice")
+                    .annotate(votes=Sum("count"))
+                    .values_list("choice", "votes")
+                    .order_by()
+                )
+        return obj._tally
+
+    @admin.display(description="Votos sim")
+    def yes_votes(self, obj):
+        return self.tally(obj).get("YES", 0)
+
+    @admin.display(description="Votos não")
+    def no_votes(self, obj):
+        return self.tally(obj).get("NO", 0)
+
+    @admin.display(description="Total de votos")
+    def total_votes(self, obj):
+        return sum(self.tally(obj).values())
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_topic(obj.pk)
+
+    def delete_model(self, request, obj):
+        topic_id = obj.pk
+        super().delete_model(request, obj)
+        invalidate_topic(topic_id)
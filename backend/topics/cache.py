@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from voting_system import metrics
+from .models import Topic
+
+
+def get_cache():
+    return caches[settings.TOPIC_CACHE_ALIAS]
+
+
+def detail_key(topic_id):
+    return f"topic:{topic_id}:detail"
+
+
+def result_key(topic_id):
+    return f"topic:{topic_id}:result"
+
+
+def cache_timeout(topic, final=True):
+    """
+    CLOSED topics never change again, so they are cached with no expiry.
+    Open sessions expire at the latest when the session ends, since the
+    cached payload depends on whether the session is still active.
+    Pass ``final=False`` for a payload that can still change once the topic
+    is CLOSED (a result read before its snapshot exists).
+    """
+    if topic.status == "CLOSED" and final:
+        return None
+
+    timeout = settings.TOPIC_CACHE_TIMEOUT
+    if topic.status == "OPEN" and topic.session_started_at:
+        session_end = topic.session_started_at + timezone.timedelta(
+            minutes=topic.session_duration
+        )
+        remaining = int((session_end - timezone.now()).total_seconds())
+        timeout = max(0, min(timeout, remaining))
+    return timeout
+
+
+async def get_or_build(key, kind, build):
+    """
+    Returns the cached payload for ``key`` or builds it. ``build`` is a
+    coroutine function returning a ``(payload, timeout)`` pair; a timeout
+    of 0 skips storing it.
+    """
+    cache = get_cache()
+    payload = await cache.aget(key)
+    if payload is not None:
+        metrics.incr(f"topic_cache.{kind}.hits")
+        return payload
+
+    metrics.incr(f"topic_cache.{kind}.misses")
+    payload, timeout = await build()
+    if timeout != 0:
+        await cache.aset(key, payload, timeout)
+    return payload
+
+
+def invalidate_result(topic_id):
+    get_cache().delete(result_key(topic_id))
+
+
+def invalidate_topic(topic_id):
+    get_cache().delete_many([detail_key(topic_id), result_key(topic_id)])
+
+
+def invalidate_topics(topic_ids):
+    keys = []
+    for topic_id in topic_ids:
+        keys += [detail_key(topic_id), result_key(topic_id)]
+    if keys:
+        get_cache().delete_many(keys)
+
+
+def invalidate_authored_topics(user_ids):
+    """Drops the cached payloads of the users' topics, which embed their name."""
+    invalidate_topics(
+        Topic.objects.filter(created_by__in=user_ids).values_list("pk", flat=True)
+    )
@@ -0,0 +1,73 @@
+import statistics
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+from topics.models import Topic
+from topics.serializers import TopicListSerializer, TopicSerializer, parse_list_fields
+
+ORDERING = ("-created_at", "-id")
+
+
+class Command(BaseCommand):
+    help = (
+        "Times fetching and serializing the newest topics with TopicSerializer "
+        "and with the listing's projected TopicListSerializer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=1000, help="Topics serialized per run."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per serializer."
+        )
+        parser.add_argument(
+            "--fields",
+            default="",
+            help="Comma-separated listing fields for the projection, like ?fields=.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            fields = parse_list_fields(options["fields"])
+        except ValueError as exc:
+            raise CommandError(exc)
+        rows, repeat = options["rows"], max(1, options["repeat"])
+
+        def model_serializer():
+            topics = Topic.objects.select_related("created_by").order_by(*ORDERING)
+            return TopicSerializer(topics[:rows], many=True).data
+
+        def projection():
+            serializer = TopicListSerializer(fields)
+            topics = Topic.objects.order_by(*ORDERING).values(*serializer.columns)
+            return serializer.render(topics[:rows])
+
+        results = {}
+        for name, build in (
+            ("TopicSerializer", model_serializer),
+            ("TopicListSerializer", projection),
+        ):
+            count = len(build())  # warm-up
+            if not count:
+                raise CommandError("No topics to serialize.")
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                build()
+                timings.append(time.perf_counter() - started)
+
+            tracemalloc.start()
+            build()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[name] = median = statistics.median(timings)
+            self.stdout.write(
+                f"{name}: {count} topics, median {median * 1000:.1f} ms "
+                f"({median / count * 1e6:.1f} us/topic), "
+                f"peak memory {peak / 1024:.0f} KiB"
+            )
+
+        speedup = results["TopicSerializer"] / results["TopicListSerializer"]
+        self.stdout.write(f"Projection speedup: {speedup:.1f}x")
@@ -0,0 +1,60 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+from topics.cache import invalidate_topics
+from topics.models import Topic
+from votes.snapshots import snapshot_closed_topics
+
+
+class Command(BaseCommand):
+    help = "Closes expired voting sessions, once or periodically with --loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and close expired sessions every tick.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.SESSION_EXPIRY_TICK,
+            help="Seconds between ticks when running with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["loop"]:
+            self.tick()
+            return
+
+        self.stdout.write(
+            f"Closing expired sessions every {options['interval']} seconds..."
+        )
+        try:
+            while True:
+                try:
+                    self.tick()
+                except DatabaseError as exc:
+                    # Keep the scheduler alive across database restarts
+                    self.stderr.write(f"Tick failed: {exc}")
+                finally:
+                    close_old_connections()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Scheduler stopped.")
+
+    def tick(self):
+        topic_ids = list(Topic.objects.expired().values_list("pk", flat=True))
+        if topic_ids:
+            closed = Topic.objects.filter(pk__in=topic_ids).close_expired()
+            # Cached payloads still say OPEN; closed results get cached for good
+            invalidate_topics(topic_ids)
+            if closed:
+                self.stdout.write(f"{closed} session(s) closed.")
+
+        # Also picks up topics closed earlier whose buffered votes were
+        # flushed since
+        snapshotted = snapshot_closed_topics()
+        if snapshotted:
+            self.stdout.write(f"{len(snapshotted)} result(s) snapshotted.")
@@ -1,10 +1,52 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import DurationField, ExpressionWrapper, F, Q
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
 User = get_user_model()
 
 
+def default_tally_shards():
+    return settings.TALLY_SHARDS
+
+
+class TopicQuerySet(models.QuerySet):
+    def with_session_end(self):
+        return self.annotate(
+            session_ends_at=F("session_started_at")
+            + ExpressionWrapper(
+                F("session_duration") * timedelta(minutes=1),
+                output_field=DurationField(),
+            )
+        )
+
+    def active(self):
+        return self.with_session_end().filter(
+            status="OPEN", session_ends_at__gt=timezone.now()
+        )
+
+    def inactive(self):
+        return self.with_session_end().exclude(
+            status="OPEN", session_ends_at__gt=timezone.now()
+        )
+
+    def expired(self):
+        return self.with_session_end().filter(
+            Q(session_started_at__isnull=True) | Q(session_ends_at__lte=timezone.now()),
+            status="OPEN",
+        )
+
+    def close_expired(self):
+        """
+        Closes every OPEN session whose time is up with a single UPDATE.
+        Returns the number of topics closed.
+        """
+        return self.expired().update(status="CLOSED", updated_at=timezone.now())
+
+
 class Topic(models.Model):
     STATUS_CHOICES = [
         ("WAITING", "Aguardando Abertura"),
@@ -25,10 +67,31 @@ class Topic(models.Model):
     session_started_at = models.DateTimeField(null=True, blank=True)
     session_duration = models.IntegerField(default=60, help_text="Duração em minutos")
 
+    # Counter rows per option the vote tally is spread over (votes.TallyShard)
+    tally_shards = models.PositiveSmallIntegerField(
+        default=default_tally_shards,
+        validators=[MinValueValidator(1), MaxValueValidator(256)],
+        help_text="Raise for topics expecting many votes per second",
+    )
+
+    objects = TopicQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Pauta"
         verbose_name_plural = "Pautas"
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            # Newest-first listing and its keyset pagination
+            models.Index(fields=["-created_at", "-id"], name="topic_newest_idx"),
+            # Listing filtered by status
+            models.Index(
+                fields=["status", "-created_at", "-id"], name="topic_status_newest_idx"
+            ),
+            # Open-session lookups (scheduler, active filter)
+            models.Index(
+                fields=["status", "session_started_at"], name="topic_open_session_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -42,8 +105,3 @@ class Topic(models.Model):
             minutes=self.session_duration
         )
         return timezone.now() < session_end
-
-    def close_session_if_expired(self):
-        if self.status == "OPEN" and not self.is_session_active:
-            self.status = "CLOSED"
-            self.save()
@@ -1,3 +1,5 @@
+from datetime import timedelta
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Topic
 
@@ -38,3 +40,118 @@ class SessionStartSerializer(serializers.Serializer):
     duration = serializers.IntegerField(
         default=60, min_value=1, max_value=1440
     )  # Max 24 hours
+
+
+# One shared instance: renders datetimes exactly like TopicSerializer does
+datetime_field = serializers.DateTimeField()
+
+
+def column(name):
+    return lambda row, context: row[name]
+
+
+def datetime_column(name):
+    return lambda row, context: datetime_field.to_representation(row[name])
+
+
+def session_active(row, context):
+    started = row["session_started_at"]
+    return (
+        row["status"] == "OPEN"
+        and started is not None
+        and context["now"] < started + timedelta(minutes=row["session_duration"])
+    )
+
+
+# Listing fields, in output order: the columns each one reads and how its
+# value is built from a ``.values()`` row
+LIST_FIELDS = {
+    "id": (("id",), column("id")),
+    "title": (("title",), column("title")),
+    "description": (("description",), column("description")),
+    "status": (("status",), column("status")),
+    "created_at": (("created_at",), datetime_column("created_at")),
+    "updated_at": (("updated_at",), datetime_column("updated_at")),
+    "session_started_at": (
+        ("session_started_at",),
+        datetime_column("session_started_at"),
+    ),
+    "session_duration": (("session_duration",), column("session_duration")),
+    "created_by": (("created_by",), column("created_by")),
+    "created_by_name": (("created_by__name",), column("created_by__name")),
+    "is_session_active": (
+        ("status", "session_started_at", "session_duration"),
+        session_active,
+    ),
+}
+VALIDATOR_COLUMNS = (
+    "id",
+    "created_at",
+    "updated_at",
+    "status",
+    "session_started_at",
+    "session_duration",
+)
+MY_VOTE_FIELDS = {
+    "has_voted": ((), lambda row, context: row["id"] in context["my_votes"]),
+    "my_vote": ((), lambda row, context: context["my_votes"].get(row["id"])),
+}
+
+
+def parse_list_fields(value):
+    """
+    ``?fields=`` -> the listing fields to render, in output order; all of
+    them when empty. Raises ValueError for unknown names.
+    """
+    if not value:
+        return list(LIST_FIELDS)
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = sorted(requested - LIST_FIELDS.keys())
+    if unknown:
+        raise ValueError("Campo inválido: " + ", ".join(unknown))
+    return [name for name in LIST_FIELDS if name in requested]
+
+
+class TopicListSerializer:
+    """
+    Renders the topic listing from ``.values(*serializer.columns)`` rows,
+    with the same output as TopicSerializer but no model instances and no
+    per-row field lookup: the getters are resolved once, up front.
+
+    With ``my_votes``, set ``context["my_votes"]`` before rendering.
+    """
+
+    def __init__(self, fields, my_votes=False):
+        getters = {name: LIST_FIELDS[name] for name in fields}
+        if my_votes:
+            getters.update(MY_VOTE_FIELDS)
+        self.getters = [(name, get) for name, (_, get) in getters.items()]
+        # Always read: the keyset cursor and the page validator need them
+        columns = list(VALIDATOR_COLUMNS)
+        for names, _ in getters.values():
+            columns.extend(names)
+        self.columns = list(dict.fromkeys(columns))
+        self.context = {"now": timezone.now()}
+        # Renaming the author doesn't touch the topic's updated_at
+        self.with_author_name = "created_by_name" in getters
+
+    def validator(self, rows):
+        """
+        What the rendered rows depend on, besides ``my_votes``: which topics,
+        when each was last written, whether its session is still running and,
+        when rendered, its author's name.
+        """
+        context = self.context
+        return [
+            (
+                row["id"],
+                row["updated_at"],
+                session_active(row, context),
+                row["created_by__name"] if self.with_author_name else None,
+            )
+            for row in rows
+        ]
+
+    def render(self, rows):
+        getters, context = self.getters, self.context
+        return [{name: get(row, context) for name, get in getters} for row in rows]
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .cache import invalidate_authored_topics
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def author_saved(sender, instance, created, update_fields, **kwargs):
+    # Only a rename changes the cached topics (logins save last_login alone)
+    if created or (update_fields is not None and "name" not in update_fields):
+        return
+    invalidate_authored_topics([instance.pk])
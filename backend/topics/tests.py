@@ -1,8 +1,14 @@
-from django.test import TestCase
+import json
+from io import StringIO
+from django.test import AsyncClient, TestCase
+from django.core.cache import cache
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
+from users.authentication import UserRefreshToken
 from .models import Topic
+from .serializers import TopicSerializer
 from django.urls import reverse
 from django.utils import timezone
 
@@ -44,22 +50,70 @@ class TopicModelTest(TestCase):
         topic.save()
         self.assertFalse(topic.is_session_active)
 
-    def test_close_session_if_expired(self):
-        topic = Topic.objects.create(
-            title="Sessão",
+
+class TopicSessionExpiryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.active = Topic.objects.create(
+            title="Ativa",
+            description="desc",
+            created_by=self.user,
+            status="OPEN",
+            session_started_at=timezone.now() - timezone.timedelta(minutes=30),
+            session_duration=60,
+        )
+        self.expired = Topic.objects.create(
+            title="Expirada",
             description="desc",
             created_by=self.user,
             status="OPEN",
             session_started_at=timezone.now() - timezone.timedelta(minutes=61),
             session_duration=60,
         )
-        topic.close_session_if_expired()
-        topic.refresh_from_db()
-        self.assertEqual(topic.status, "CLOSED")
+        self.waiting = Topic.objects.create(
+            title="Aguardando", description="desc", created_by=self.user
+        )
+
+    def test_active_and_expired_querysets(self):
+        self.assertEqual(list(Topic.objects.active()), [self.active])
+        self.assertEqual(list(Topic.objects.expired()), [self.expired])
+
+    def test_close_expired_bulk_update(self):
+        with self.assertNumQueries(1):
+            closed = Topic.objects.close_expired()
+        self.assertEqual(closed, 1)
+        self.expired.refresh_from_db()
+        self.active.refresh_from_db()
+        self.waiting.refresh_from_db()
+        self.assertEqual(self.expired.status, "CLOSED")
+        self.assertEqual(self.active.status, "OPEN")
+        self.assertEqual(self.waiting.status, "WAITING")
+
+    def test_close_expired_sessions_command(self):
+        out = StringIO()
+        call_command("close_expired_sessions", stdout=out)
+        self.expired.refresh_from_db()
+        self.assertEqual(self.expired.status, "CLOSED")
+        self.assertIn("1 session(s) closed", out.getvalue())
+
+    def test_read_endpoints_do_not_write(self):
+        client = APIClient()
+        client.get("/topics")
+        response = client.get(f"/topics/{self.expired.id}")
+        self.expired.refresh_from_db()
+        self.assertEqual(self.expired.status, "OPEN")
+        self.assertFalse(response.json()["is_session_active"])
 
 
 class TopicAPITest(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(
             cpf="12345678901",
             name="Test User",
@@ -73,7 +127,7 @@ class TopicAPITest(TestCase):
         Topic.objects.create(title="Pauta 1", description="desc", created_by=self.user)
         response = self.client.get(self.topics_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertTrue(len(response.data) >= 1)
+        self.assertTrue(len(response.json()["results"]) >= 1)
 
     def test_create_topic_unauthenticated(self):
         data = {"title": "Nova Pauta", "description": "Desc"}
@@ -94,7 +148,74 @@ class TopicAPITest(TestCase):
         url = f"/topics/{topic.id}"
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data["title"], "Detalhe")
+        self.assertEqual(response.json()["title"], "Detalhe")
+
+    def test_topic_detail_cached_until_session_starts(self):
+        topic = Topic.objects.create(
+            title="Detalhe", description="desc", created_by=self.user
+        )
+        url = f"/topics/{topic.id}"
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.json()["status"], "WAITING")
+
+        self.client.force_authenticate(user=self.user)
+        self.client.post(f"/topics/{topic.id}/session", {"duration": 30})
+        response = self.client.get(url)
+        self.assertEqual(response.json()["status"], "OPEN")
+        self.assertTrue(response.json()["is_session_active"])
+
+    def test_detail_conditional_get(self):
+        topic = Topic.objects.create(
+            title="Detalhe", description="desc", created_by=self.user
+        )
+        url = f"/topics/{topic.id}"
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        self.client.force_authenticate(user=self.user)
+        self.client.post(f"/topics/{topic.id}/session", {"duration": 30})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["status"], "OPEN")
+
+    def test_list_conditional_get(self):
+        Topic.objects.create(title="Pauta 1", description="desc", created_by=self.user)
+        etag = self.client.get(self.topics_url)["ETag"]
+        # Only the page query runs, nothing is serialized
+        with self.assertNumQueries(1):
+            response = self.client.get(self.topics_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Topic.objects.create(title="Pauta 2", description="desc", created_by=self.user)
+        response = self.client.get(self.topics_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    def test_author_rename_changes_etags(self):
+        topic = Topic.objects.create(
+            title="Pauta", description="desc", created_by=self.user, status="CLOSED"
+        )
+        detail_url = f"/topics/{topic.id}"
+        detail_etag = self.client.get(detail_url)["ETag"]
+        list_etag = self.client.get(self.topics_url)["ETag"]
+        sparse_etag = self.client.get(f"{self.topics_url}?fields=id")["ETag"]
+
+        self.user.name = "Novo Nome"
+        self.user.save()
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["created_by_name"], "Novo Nome")
+        response = self.client.get(self.topics_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The name isn't rendered there, so the page is still fresh
+        response = self.client.get(
+            f"{self.topics_url}?fields=id", HTTP_IF_NONE_MATCH=sparse_etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
 
     def test_start_session_unauthenticated(self):
         topic = Topic.objects.create(
@@ -113,3 +234,193 @@ class TopicAPITest(TestCase):
         response = self.client.post(url, {"duration": 30})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("message", response.data)
+
+
+class TopicListingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.topics = [
+            Topic.objects.create(
+                title=f"Pauta {i}", description="desc", created_by=self.user
+            )
+            for i in range(5)
+        ]
+        # Same created_at for all rows forces the id tie-breaker
+        Topic.objects.update(created_at=timezone.now())
+
+    def test_keyset_pages_cover_all_topics_once(self):
+        seen = []
+        url = "/topics?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.json()["results"]), 2)
+            seen.extend(item["id"] for item in response.json()["results"])
+            url = response.json()["next"]
+        self.assertEqual(seen, sorted((t.id for t in self.topics), reverse=True))
+
+    def test_list_query_count_is_constant(self):
+        # The page with its authors; the ETag is derived from its rows
+        with self.assertNumQueries(1):
+            response = self.client.get("/topics")
+        self.assertEqual(len(response.json()["results"]), 5)
+        self.assertEqual(response.json()["results"][0]["created_by_name"], "Test User")
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/topics?cursor=garbage")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filter_by_status(self):
+        Topic.objects.filter(pk=self.topics[0].pk).update(status="CLOSED")
+        response = self.client.get("/topics?status=CLOSED")
+        self.assertEqual(
+            [item["id"] for item in response.json()["results"]], [self.topics[0].id]
+        )
+
+    def test_filter_by_invalid_status(self):
+        response = self.client.get("/topics?status=FOO")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.json())
+
+    def test_filter_by_session_active(self):
+        Topic.objects.filter(pk=self.topics[1].pk).update(
+            status="OPEN", session_started_at=timezone.now()
+        )
+        Topic.objects.filter(pk=self.topics[2].pk).update(
+            status="OPEN",
+            session_started_at=timezone.now() - timezone.timedelta(minutes=61),
+        )
+        response = self.client.get("/topics?active=true")
+        self.assertEqual(
+            [item["id"] for item in response.json()["results"]], [self.topics[1].id]
+        )
+        response = self.client.get("/topics?active=false")
+        self.assertNotIn(
+            self.topics[1].id, [item["id"] for item in response.json()["results"]]
+        )
+        self.assertEqual(len(response.json()["results"]), 4)
+
+
+class TopicListProjectionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.topics = [
+            Topic.objects.create(
+                title=f"Pauta {i}", description="desc " * 50, created_by=self.user
+            )
+            for i in range(3)
+        ]
+        Topic.objects.filter(pk=self.topics[0].pk).update(
+            status="OPEN", session_started_at=timezone.now()
+        )
+        Topic.objects.filter(pk=self.topics[1].pk).update(
+            status="OPEN",
+            session_started_at=timezone.now() - timezone.timedelta(minutes=61),
+        )
+
+    def test_matches_topic_serializer(self):
+        response = self.client.get("/topics")
+        topics = Topic.objects.select_related("created_by").order_by("-created_at")
+        expected = json.loads(json.dumps(TopicSerializer(topics, many=True).data))
+        self.assertEqual(response.json()["results"], expected)
+
+    def test_sparse_fields(self):
+        response = self.client.get("/topics?fields=title,id,is_session_active")
+        results = response.json()["results"]
+        self.assertEqual(list(results[0]), ["id", "title", "is_session_active"])
+        active = {item["id"]: item["is_session_active"] for item in results}
+        self.assertTrue(active[self.topics[0].id])
+        self.assertFalse(active[self.topics[1].id])
+
+        # Without the author's name the listing needs no join
+        with self.assertNumQueries(1) as queries:
+            self.client.get("/topics?fields=id,title")
+        self.assertNotIn("JOIN", queries.captured_queries[-1]["sql"])
+
+    def test_sparse_fields_paginate(self):
+        seen = []
+        url = "/topics?fields=id&page_size=2"
+        while url:
+            response = self.client.get(url)
+            seen.extend(item["id"] for item in response.json()["results"])
+            url = response.json()["next"]
+        self.assertEqual(seen, sorted((t.id for t in self.topics), reverse=True))
+
+    def test_invalid_field(self):
+        response = self.client.get("/topics?fields=id,password")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {"error": "Campo inválido: password"})
+
+    def test_fields_change_etag(self):
+        full = self.client.get("/topics")
+        sparse = self.client.get("/topics?fields=id")
+        self.assertNotEqual(full["ETag"], sparse["ETag"])
+        self.assertEqual(self.client.get("/topics?fields=id")["ETag"], sparse["ETag"])
+
+    def test_sparse_fields_with_my_vote(self):
+        token = UserRefreshToken.for_user(self.user).access_token
+        response = self.client.get(
+            "/topics?fields=id&include=my_vote", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        self.assertEqual(
+            response.json()["results"][0],
+            {"id": self.topics[2].id, "has_voted": False, "my_vote": None},
+        )
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_topic_list", rows=3, repeat=1, stdout=out)
+        self.assertIn("TopicListSerializer: 3 topics", out.getvalue())
+        self.assertIn("Projection speedup", out.getvalue())
+
+
+class TopicAsyncReadTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.topic = Topic.objects.create(
+            title="Pauta", description="desc", created_by=self.user
+        )
+
+    async def test_reads_served_natively_over_asgi(self):
+        client = AsyncClient()
+        response = await client.get("/topics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["id"], self.topic.id)
+
+        response = await client.get(f"/topics/{self.topic.id}")
+        self.assertEqual(response.json()["created_by_name"], "Test User")
+
+        response = await client.get(f"/topics/{self.topic.id}/result")
+        self.assertEqual(response.json()["total_votes"], 0)
+
+    async def test_errors_are_json(self):
+        client = AsyncClient()
+        response = await client.get("/topics/999999")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn("detail", response.json())
+
+        response = await client.get("/topics?cursor=bad")
+        self.assertEqual(response.json(), {"detail": "Cursor inválido"})
+
+        response = await client.delete(f"/topics/{self.topic.id}/result")
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -1,51 +1,158 @@
+from asgiref.sync import sync_to_async
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed, NotFound
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from users.authentication import authenticate_user
+from votes.buffer import afind_user_votes
+from voting_system.idempotency import idempotent
+from voting_system.instrumentation import span
+from voting_system.responses import (
+    PRIVATE_REVALIDATE,
+    conditional_json,
+    is_not_modified,
+    json_response,
+    make_etag,
+    method_not_allowed,
+    not_found,
+)
+from .cache import cache_timeout, detail_key, get_or_build, invalidate_topic
 from .models import Topic
-from .serializers import TopicSerializer, TopicCreateSerializer, SessionStartSerializer
+from .pagination import KeysetPagination
+from .serializers import (
+    SessionStartSerializer,
+    TopicCreateSerializer,
+    TopicListSerializer,
+    TopicSerializer,
+    parse_list_fields,
+)
+
+
+def filter_topics(queryset, params):
+    """
+    Applies the public listing filters: ``status`` and ``active``.
+    Returns the filtered queryset, or an error message for bad values.
+    """
+    topic_status = params.get("status")
+    if topic_status:
+        if topic_status not in dict(Topic.STATUS_CHOICES):
+            return None, "Status inválido: " + topic_status
+        queryset = queryset.filter(status=topic_status)
+
+    active = params.get("active")
+    if active:
+        if active.lower() in ("true", "1"):
+            queryset = queryset.active()
+        elif active.lower() in ("false", "0"):
+            queryset = queryset.inactive()
+        else:
+            return None, "Valor inválido para active: " + active
+
+    return queryset, None
+
+
+async def topics_view(request):
+    # Public, async listing; creating a topic goes through the DRF view
+    if request.method not in ("GET", "HEAD"):
+        return await sync_to_async(create_topic_view)(request)
+
+    # ?include=my_vote adds the caller's own vote to every topic
+    with_my_votes = "my_vote" in request.GET.get("include", "").split(",")
+    if with_my_votes:
+        try:
+            user = await sync_to_async(authenticate_user)(request)
+        except AuthenticationFailed as exc:
+            return json_response({"detail": exc.detail}, status=401)
+        if user is None:
+            return json_response({"error": "Autenticação necessária"}, status=401)
+
+    # Read-only: expired sessions are closed by the scheduler
+    topics, error = filter_topics(Topic.objects.all(), request.GET)
+    if error:
+        return json_response({"error": error}, status=400)
+
+    # ?fields=id,title,... renders only those fields (and reads only their
+    # columns); by default every field is rendered
+    try:
+        fields = parse_list_fields(request.GET.get("fields"))
+    except ValueError as exc:
+        return json_response({"error": str(exc)}, status=400)
+
+    # Plain rows of just the needed columns, rendered without model instances
+    serializer = TopicListSerializer(fields, my_votes=with_my_votes)
+    paginator = KeysetPagination()
+    try:
+        queryset = paginator.get_page_queryset(
+            topics.values(*serializer.columns), request
+        )
+        rows = [row async for row in queryset]
+    except NotFound as exc:
+        return not_found(exc.detail)
+
+    page = paginator.build_page(rows)
+    # Validator from the page itself: no aggregate over the whole listing
+    etag = make_etag(
+        "topics",
+        ",".join(fields),
+        serializer.validator(page),
+        paginator.next_position,
+    )
+    if not with_my_votes and is_not_modified(request, etag):
+        return conditional_json(request, None, etag)
+
+    if with_my_votes:
+        # One query for the whole page, not one per topic
+        my_votes = await afind_user_votes([row["id"] for row in page], user.pk)
+        serializer.context["my_votes"] = my_votes
+    with span("serialize"):
+        data = serializer.render(page)
+    if not with_my_votes:
+        return conditional_json(request, paginator.get_paginated_data(data), etag)
+
+    etag = make_etag(etag, user.pk, sorted(my_votes.items()))
+    response = conditional_json(
+        request, paginator.get_paginated_data(data), etag, PRIVATE_REVALIDATE
+    )
+    patch_vary_headers(response, ["Authorization"])
+    return response
+
+
+# Django 4.2's csrf_exempt decorator would turn the view into a sync one
+topics_view.csrf_exempt = True
 
 
-@api_view(["GET", "POST"])
+@api_view(["POST"])
 @permission_classes([AllowAny])
-def topics_view(request):
-    if request.method == "GET":
-        # Public endpoint - no authentication required
-        topics = Topic.objects.all()
-        # Update expired sessions
-        for topic in topics:
-            topic.close_session_if_expired()
-
-        serializer = TopicSerializer(topics, many=True)
-        return Response(serializer.data)
-
-    elif request.method == "POST":
-        # Creating topics requires authentication
-        if not request.user.is_authenticated:
-            return Response(
-                {"error": "Autenticação necessária"},
-                status=status.HTTP_401_UNAUTHORIZED,
-            )
-
-        serializer = TopicCreateSerializer(data=request.data)
-        if serializer.is_valid():
-            topic = serializer.save(created_by=request.user)
-            response_serializer = TopicSerializer(topic)
-            return Response(
-                {
-                    "message": "Pauta criada com sucesso!",
-                    "topic": response_serializer.data,
-                },
-                status=status.HTTP_201_CREATED,
-            )
+@idempotent
+def create_topic_view(request):
+    # Creating topics requires authentication
+    if not request.user.is_authenticated:
+        return Response(
+            {"error": "Autenticação necessária"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
 
+    serializer = TopicCreateSerializer(data=request.data)
+    if serializer.is_valid():
+        topic = serializer.save(created_by=request.user)
+        response_serializer = TopicSerializer(topic)
         return Response(
-            {"error": "Erro ao criar pauta", "details": serializer.errors},
-            status=status.HTTP_400_BAD_REQUEST,
+            {
+                "message": "Pauta criada com sucesso!",
+                "topic": response_serializer.data,
+            },
+            status=status.HTTP_201_CREATED,
         )
 
+    return Response(
+        {"error": "Erro ao criar pauta", "details": serializer.errors},
+        status=status.HTTP_400_BAD_REQUEST,
+    )
+
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -69,6 +176,7 @@ def start_session_view(request, topic_id):
         topic.session_started_at = timezone.now()
         topic.session_duration = duration
         topic.save()
+        invalidate_topic(topic.id)
 
         response_serializer = TopicSerializer(topic)
         return Response(
@@ -81,11 +189,37 @@ def start_session_view(request, topic_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(["GET"])
-@permission_classes([AllowAny])
-def topic_detail_view(request, topic_id):
-    topic = get_object_or_404(Topic, id=topic_id)
-    topic.close_session_if_expired()  # Update status if needed
-
-    serializer = TopicSerializer(topic)
-    return Response(serializer.data)
+async def topic_detail_view(request, topic_id):
+    if request.method not in ("GET", "HEAD"):
+        return method_not_allowed(["GET"])
+
+    async def build():
+        try:
+            topic = await Topic.objects.select_related("created_by").aget(id=topic_id)
+        except Topic.DoesNotExist:
+            return None, 0
+
+        etag = topic_etag(topic)
+        if is_not_modified(request, etag):
+            # Nothing to send: skip serializing, and leave the cache alone
+            return {"etag": etag, "data": None}, 0
+        with span("serialize"):
+            data = TopicSerializer(topic).data
+        return {"etag": etag, "data": data}, cache_timeout(topic)
+
+    entry = await get_or_build(detail_key(topic_id), "detail", build)
+    if entry is None:
+        return not_found()
+    return conditional_json(request, entry["data"], entry["etag"])
+
+
+def topic_etag(topic):
+    # is_session_active flips without any write when the session runs out,
+    # and renaming the author doesn't touch the topic
+    return make_etag(
+        "topic",
+        topic.id,
+        topic.updated_at,
+        topic.is_session_active,
+        topic.created_by.name,
+    )
@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from voting_system.routers import pin_if_sticky, stick_user
+from .models import User
+
+# User fields copied into the tokens: what views and permissions read
+USER_CLAIMS = ("name", "is_active", "is_staff", "is_superuser")
+
+
+def stamp_cache():
+    return caches[settings.AUTH_CACHE_ALIAS]
+
+
+def stamp_key(user_id):
+    return f"auth:user:{user_id}:changed"
+
+
+class UserRefreshToken(RefreshToken):
+    """Refresh token whose access tokens also carry the USER_CLAIMS."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for field in USER_CLAIMS:
+            token[field] = getattr(user, field)
+        return token
+
+
+class UserCache:
+    """Bounded in-process LRU of users, each entry valid for ``ttl`` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id, changed_at=None):
+        """The cached user, unless it expired or predates ``changed_at``."""
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            user, loaded_at = entry
+            if time.time() - loaded_at > self.ttl or (
+                changed_at is not None and loaded_at < changed_at
+            ):
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        with self.lock:
+            self.entries[user_id] = (user, time.time())
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+
+
+def user_changed(user_id):
+    """
+    Marks the user as changed: tokens issued and users cached before now are
+    no longer trusted. The stamp lives in the shared AUTH_CACHE_ALIAS cache
+    so every worker sees it.
+    """
+    user_cache.delete(user_id)
+    stamp_cache().set(stamp_key(user_id), time.time(), settings.AUTH_USER_STAMP_TIMEOUT)
+
+
+def user_from_claims(token):
+    user = User(pk=token[api_settings.USER_ID_CLAIM])
+    for field in USER_CLAIMS:
+        setattr(user, field, token[field])
+    # Behave like a loaded row, not a new one
+    user._state.adding = False
+    user._state.db = "default"
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that does not load the user row on every request.
+
+    The user is taken from the in-process cache or built from the token
+    claims. The database is only read for tokens without claims or tokens
+    issued before the user last changed (see ``user_changed``).
+    With AUTH_TRUST_TOKEN_CLAIMS off, every request loads the user row.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            # Read-your-writes on the replicas, keyed by user
+            if request.method in SAFE_METHODS:
+                pin_if_sticky(result[0].pk)
+            else:
+                stick_user(result[0].pk)
+        return result
+
+    def get_user(self, validated_token):
+        if not settings.AUTH_TRUST_TOKEN_CLAIMS:
+            # Per-process cache with several workers: a change would not be
+            # seen by the other workers, so always load the row
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        changed_at = stamp_cache().get(stamp_key(user_id))
+        user = user_cache.get(user_id, changed_at)
+        if user is None:
+            has_claims = all(field in validated_token for field in USER_CLAIMS)
+            # "iat" has one-second resolution: same-second tokens go to the DB
+            if has_claims and (
+                changed_at is None or validated_token.get("iat", 0) > changed_at
+            ):
+                user = user_from_claims(validated_token)
+            else:
+                user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
+
+
+def authenticate_user(request):
+    """
+    The user of the JWT on a plain Django request, or None when it carries
+    no token. Raises AuthenticationFailed for a bad token.
+    """
+    result = CachedJWTAuthentication().authenticate(request)
+    return None if result is None else result[0]
@@ -0,0 +1,14 @@
+def cpf_digits(value):
+    """The CPF without its punctuation."""
+    return "".join(filter(str.isdigit, value))
+
+
+def normalize_cpf(value):
+    """
+    The CPF as stored: digits only. Raises ValueError when it does not
+    have 11 digits.
+    """
+    cpf = cpf_digits(value)
+    if len(cpf) != 11:
+        raise ValueError("CPF deve ter 11 dígitos.")
+    return cpf
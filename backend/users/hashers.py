@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.hashers import make_password
+
+# Bounds the CPU spent on password hashing across all requests
+_pool = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+
+
+def run_hashing(func, *args):
+    """Runs CPU-bound hashing in the bounded pool and waits for the result."""
+    return _pool.submit(func, *args).result()
+
+
+def setup_hashing_process():
+    # Spawned worker processes start without Django configured
+    django.setup()
+
+
+def hash_password(password):
+    """make_password for process pools; None gives an unusable password."""
+    return make_password(password)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the work factor from PASSWORD_HASH_ITERATIONS.
+
+    Hashes stored with another iteration count are upgraded on the next
+    successful login. The digest itself runs in the bounded hashing pool.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+    def encode(self, password, salt, iterations=None):
+        return run_hashing(super().encode, password, salt, iterations)
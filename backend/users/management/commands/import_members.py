@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from users.provisioning import MemberImporter, read_members
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports members from a CSV (cpf,name,email,password header) or NDJSON "
+        "file, hashing passwords in parallel and inserting in bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or - for standard input.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "ndjson"],
+            dest="file_format",
+            help="Input format; guessed from the file extension by default.",
+        )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Update the name and email of members already registered "
+            "instead of skipping them.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes hashing passwords (default: one per core).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["file_format"]
+        if file_format is None:
+            if path == "-":
+                raise CommandError("--format is required when reading stdin.")
+            file_format = "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+
+        importer = MemberImporter(options["workers"], update=options["update"])
+        started = time.monotonic()
+        processed = 0
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            records = read_members(stream, file_format)
+            while chunk := list(islice(records, options["batch_size"])):
+                importer.import_chunk(chunk)
+                processed += len(chunk)
+                # Progress after every chunk
+                self.stdout.write(self.summary(importer, processed, started))
+        finally:
+            importer.close()
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line, error in importer.errors:
+            self.stderr.write(f"Line {line}: {error}")
+        self.stdout.write(
+            self.style.SUCCESS(self.summary(importer, processed, started))
+        )
+
+    def summary(self, importer, processed, started):
+        elapsed = time.monotonic() - started
+        stats = importer.stats
+        return (
+            f"{processed} record(s): {stats['created']} created, "
+            f"{stats['updated']} updated, {stats['skipped']} skipped, "
+            f"{stats['rejected']} rejected ({processed / max(elapsed, 1e-9):.0f}/s)."
+        )
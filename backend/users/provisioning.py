@@ -0,0 +1,178 @@
+import csv
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from topics.cache import invalidate_authored_topics
+from .authentication import user_changed
+from .hashers import hash_password, setup_hashing_process
+from .cpf import normalize_cpf
+from .models import User
+
+
+def read_members(stream, file_format):
+    """Yields ``(line, record)`` pairs from a CSV (with header) or NDJSON stream."""
+    if file_format == "csv":
+        for line, record in enumerate(csv.DictReader(stream), start=2):
+            yield line, record
+        return
+    for line, text in enumerate(stream, start=1):
+        if text.strip():
+            try:
+                yield line, json.loads(text)
+            except ValueError:
+                yield line, None
+
+
+def clean_member(record):
+    """
+    Validates one input record the way registration does. Returns the
+    member's fields, or raises ValueError with the reason.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Registro inválido")
+    cpf = normalize_cpf(str(record.get("cpf") or ""))
+
+    name = str(record.get("name") or "").strip()
+    if not name or len(name) > 150:
+        raise ValueError("Nome é obrigatório (até 150 caracteres)")
+
+    # Blank emails are stored as NULL: "" would collide on the unique index
+    email = User.objects.normalize_email(str(record.get("email") or "").strip())
+    if email:
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise ValueError("Email inválido")
+
+    return {
+        "cpf": cpf,
+        "name": name,
+        "email": email or None,
+        "password": record.get("password") or None,
+    }
+
+
+class MemberImporter:
+    """
+    Provisions members in chunks: one query finds the CPFs already
+    registered, new members' passwords are hashed across a process pool
+    and the rows are written with one bulk INSERT.
+
+    Existing members are skipped, or with ``update`` get their name and
+    email updated; their password is left alone.
+    """
+
+    def __init__(self, workers, update=False):
+        self.update = update
+        # Spawned, not forked: a forked child would inherit the hashing
+        # thread pool without its threads
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=setup_hashing_process,
+        )
+        self.workers = workers
+        self.seen = set()
+        self.stats = {"created": 0, "updated": 0, "skipped": 0, "rejected": 0}
+        self.errors = []
+
+    def close(self):
+        self.pool.shutdown()
+
+    def reject(self, line, error):
+        self.stats["rejected"] += 1
+        self.errors.append((line, error))
+
+    def import_chunk(self, records):
+        members = []
+        for line, record in records:
+            try:
+                member = clean_member(record)
+            except ValueError as exc:
+                self.reject(line, str(exc))
+                continue
+            if member["cpf"] in self.seen:
+                self.reject(line, "CPF repetido no arquivo")
+                continue
+            self.seen.add(member["cpf"])
+            members.append((line, member))
+
+        existing = dict(
+            User.objects.filter(cpf__in=[m["cpf"] for _, m in members]).values_list(
+                "cpf", "pk"
+            )
+        )
+        new = [(line, m) for line, m in members if m["cpf"] not in existing]
+        old = [(line, m) for line, m in members if m["cpf"] in existing]
+
+        if self.update:
+            self.update_members(old, existing)
+        else:
+            self.stats["skipped"] += len(old)
+        self.create_members(new)
+
+    def update_members(self, members, existing):
+        # Only what the record carries: a missing or blank email keeps the
+        # stored one
+        updates = [
+            (
+                line,
+                User(pk=existing[m["cpf"]], name=m["name"], email=m["email"]),
+                ["name", "email"] if m["email"] else ["name"],
+            )
+            for line, m in members
+        ]
+        try:
+            with transaction.atomic():
+                for fields in (["name", "email"], ["name"]):
+                    User.objects.bulk_update(
+                        [user for _, user, f in updates if f == fields], fields
+                    )
+            updated = [user for _, user, _ in updates]
+        except IntegrityError:
+            # An email taken by another member: update one by one so only
+            # the conflicting rows are rejected
+            updated = []
+            for line, user, fields in updates:
+                try:
+                    with transaction.atomic():
+                        user.save(update_fields=fields)
+                    updated.append(user)
+                except IntegrityError:
+                    self.reject(line, "Email já cadastrado para outro membro")
+
+        # bulk_update sends no post_save: drop cached users and stale tokens,
+        # and the cached topics showing the old names
+        for user in updated:
+            user_changed(user.pk)
+        invalidate_authored_topics([user.pk for user in updated])
+        self.stats["updated"] += len(updated)
+
+    def create_members(self, members):
+        passwords = self.pool.map(
+            hash_password,
+            [m["password"] for _, m in members],
+            chunksize=max(1, len(members) // (self.workers * 4)),
+        )
+        users = [
+            (line, User(cpf=m["cpf"], name=m["name"], email=m["email"], password=pw))
+            for (line, m), pw in zip(members, passwords)
+        ]
+
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([user for _, user in users])
+            self.stats["created"] += len(users)
+        except IntegrityError:
+            # A taken email or a concurrent registration: insert one by
+            # one so only the conflicting rows are rejected
+            for line, user in users:
+                try:
+                    with transaction.atomic():
+                        user.save(force_insert=True)
+                    self.stats["created"] += 1
+                except IntegrityError:
+                    self.reject(line, "CPF ou email já cadastrado")
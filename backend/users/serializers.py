@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from .cpf import cpf_digits, normalize_cpf
 from .models import User
 
 
@@ -12,20 +13,14 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         extra_kwargs = {"email": {"required": False}}
 
     def validate_cpf(self, value):
-        # Remove non-numeric characters
-        cpf = "".join(filter(str.isdigit, value))
-
-        if len(cpf) != 11:
-            raise serializers.ValidationError("CPF deve ter 11 dígitos.")
-
-        return cpf
+        try:
+            return normalize_cpf(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
 
     def create(self, validated_data):
-        password = validated_data.pop("password")
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+        # Hashes and inserts once
+        return User.objects.create_user(**validated_data)
 
 
 class UserLoginSerializer(serializers.Serializer):
@@ -37,8 +32,7 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get("password")
 
         if cpf and password:
-            # Clean CPF
-            cpf = "".join(filter(str.isdigit, cpf))
+            cpf = cpf_digits(cpf)
 
             user = authenticate(
                 request=self.context.get("request"), cpf=cpf, password=password
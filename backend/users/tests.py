@@ -1,6 +1,22 @@
-from django.test import TestCase
+import tempfile
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from unittest import mock
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.db.utils import IntegrityError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import hashers
+from .authentication import (
+    CachedJWTAuthentication,
+    UserRefreshToken,
+    stamp_cache,
+    user_cache,
+)
 
 User = get_user_model()
 
@@ -83,3 +99,220 @@ class UserModelTest(TestCase):
             password="nopass",
         )
         self.assertEqual(user.name, "")
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        stamp_cache().clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.auth = CachedJWTAuthentication()
+
+    def authenticate(self, token):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        with CaptureQueriesContext(connection) as queries:
+            user, _ = self.auth.authenticate(request)
+        return user, len(queries)
+
+    def test_login_token_authenticates_without_queries(self):
+        response = self.client.post(
+            "/login",
+            {"cpf": "123.456.789-01", "password": "testpass123"},
+            content_type="application/json",
+        )
+        user, queries = self.authenticate(response.json()["token"])
+        self.assertEqual(queries, 0)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.name, "Test User")
+        self.assertFalse(user.is_staff)
+
+    def test_deactivated_user_is_rejected(self):
+        token = UserRefreshToken.for_user(self.user).access_token
+        self.authenticate(token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_revocation_survives_cache_eviction(self):
+        token = UserRefreshToken.for_user(self.user).access_token
+        self.user.is_active = False
+        self.user.save()
+        # Enough throttle buckets and payloads to make LocMem cull entries
+        cache.set_many({f"filler:{i}": i for i in range(400)})
+        user_cache.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_changed_user_is_reloaded_once(self):
+        token = UserRefreshToken.for_user(self.user).access_token
+        self.authenticate(token)
+        self.user.name = "Renamed"
+        self.user.save()
+
+        user, queries = self.authenticate(token)
+        self.assertEqual((user.name, queries), ("Renamed", 1))
+        user, queries = self.authenticate(token)
+        self.assertEqual((user.name, queries), ("Renamed", 0))
+
+    @override_settings(AUTH_TRUST_TOKEN_CLAIMS=False)
+    def test_claims_not_trusted_without_shared_cache(self):
+        token = UserRefreshToken.for_user(self.user).access_token
+        _, queries = self.authenticate(token)
+        self.assertEqual(queries, 1)
+
+        # No change stamp: another worker's save is seen anyway
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_token_without_claims_falls_back_to_database(self):
+        token = RefreshToken.for_user(self.user).access_token
+        _, queries = self.authenticate(token)
+        self.assertEqual(queries, 1)
+        _, queries = self.authenticate(token)
+        self.assertEqual(queries, 0)
+
+
+class PasswordHashingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def register(self):
+        return self.client.post(
+            "/register",
+            {
+                "name": "New User",
+                "cpf": "11122233344",
+                "email": "new@example.com",
+                "password": "newpass123",
+            },
+            content_type="application/json",
+        )
+
+    def test_registration_hashes_once(self):
+        with mock.patch.object(
+            hashers, "run_hashing", wraps=hashers.run_hashing
+        ) as run_hashing, CaptureQueriesContext(connection) as queries:
+            response = self.register()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(run_hashing.call_count, 1)
+        self.assertFalse(
+            [q for q in queries if q["sql"].startswith("UPDATE")],
+            queries.captured_queries,
+        )
+        self.assertTrue(
+            User.objects.get(cpf="11122233344").check_password("newpass123")
+        )
+
+    def test_login_upgrades_work_factor(self):
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            self.register()
+        user = User.objects.get(cpf="11122233344")
+        self.assertIn("$1000$", user.password)
+
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            response = self.client.post(
+                "/login",
+                {"cpf": "11122233344", "password": "newpass123"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$2000$"))
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class ImportMembersCommandTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.existing = User.objects.create_user(
+            cpf="12345678901",
+            name="Old Name",
+            email="old@example.com",
+            password="oldpass123",
+        )
+
+    def run_import(self, content, *args, suffix=".csv"):
+        with tempfile.NamedTemporaryFile("w", suffix=suffix) as source:
+            source.write(content)
+            source.flush()
+            out, err = StringIO(), StringIO()
+            call_command(
+                "import_members",
+                source.name,
+                "--workers",
+                "2",
+                *args,
+                stdout=out,
+                stderr=err,
+            )
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import(self):
+        out, err = self.run_import(
+            "cpf,name,email,password\n"
+            "111.222.333-44,Ana,ana@example.com,anapass123\n"
+            "22233344455,Bruno,,\n"
+            "33344455566,Carla,,carlapass\n"
+            "123,Curto,,x\n"
+            "22233344455,Bruno de novo,,\n"
+            "12345678901,New Name,new@example.com,\n"
+            "44455566677,Duda,old@example.com,\n"
+        )
+        self.assertIn("7 record(s): 3 created, 0 updated, 1 skipped, 3 rejected", out)
+        self.assertIn("Line 5: CPF deve ter 11 dígitos.", err)
+        self.assertIn("Line 6: CPF repetido no arquivo", err)
+        self.assertIn("Line 8: CPF ou email já cadastrado", err)
+
+        ana = User.objects.get(cpf="11122233344")
+        self.assertTrue(ana.check_password("anapass123"))
+        bruno = User.objects.get(cpf="22233344455")
+        self.assertIsNone(bruno.email)
+        self.assertFalse(bruno.has_usable_password())
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, "Old Name")
+
+    def test_ndjson_upsert(self):
+        out, _ = self.run_import(
+            '{"cpf": "12345678901", "name": "New Name", "email": "new@example.com"}\n'
+            '{"cpf": "55566677788", "name": "Eva", "password": "evapass123"}\n'
+            "not json\n",
+            "--update",
+            suffix=".ndjson",
+        )
+        self.assertIn("1 created, 1 updated, 0 skipped, 1 rejected", out)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, "New Name")
+        self.assertEqual(self.existing.email, "new@example.com")
+        self.assertTrue(self.existing.check_password("oldpass123"))
+
+    def test_update_keeps_missing_email(self):
+        out, _ = self.run_import("cpf,name\n12345678901,New Name\n", "--update")
+        self.assertIn("1 updated", out)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, "New Name")
+        self.assertEqual(self.existing.email, "old@example.com")
+
+    def test_update_rejects_taken_email(self):
+        User.objects.create_user(
+            cpf="98765432100", name="Other", email="other@example.com"
+        )
+        out, err = self.run_import(
+            "cpf,name,email\n"
+            "12345678901,New Name,other@example.com\n"
+            "98765432100,Other Renamed,\n",
+            "--update",
+        )
+        self.assertIn("0 created, 1 updated, 0 skipped, 1 rejected", out)
+        self.assertIn("Line 2: Email já cadastrado para outro membro", err)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.email, "old@example.com")
+        self.assertEqual(User.objects.get(cpf="98765432100").name, "Other Renamed")
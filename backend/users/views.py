@@ -1,14 +1,20 @@
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from voting_system.throttling import (
+    LoginCPFThrottle,
+    LoginIPThrottle,
+    RegisterIPThrottle,
+)
+from .authentication import UserRefreshToken
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserSerializer
 
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@throttle_classes([RegisterIPThrottle])
 def register_view(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
@@ -16,7 +22,7 @@ def register_view(request):
         user_data = UserSerializer(user).data
 
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = UserRefreshToken.for_user(user)
 
         return Response(
             {
@@ -36,6 +42,7 @@ def register_view(request):
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@throttle_classes([LoginIPThrottle, LoginCPFThrottle])
 @csrf_exempt
 def login_view(request):
     serializer = UserLoginSerializer(data=request.data, context={"request": request})
@@ -44,7 +51,7 @@ def login_view(request):
         user_data = UserSerializer(user).data
 
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = UserRefreshToken.for_user(user)
 
         return Response(
             {
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Vote
+from .models import PendingVote, ResultSnapshot, Vote
 
 
 @admin.register(Vote)
@@ -11,3 +11,51 @@ class VoteAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related("user", "topic")
+
+
+@admin.register(PendingVote)
+class PendingVoteAdmin(admin.ModelAdmin):
+    list_display = ("user", "topic", "vote", "created_at")
+    readonly_fields = ("topic", "user", "vote", "created_at")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("user", "topic")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ResultSnapshot)
+class ResultSnapshotAdmin(admin.ModelAdmin):
+    list_display = (
+        "topic",
+        "yes_votes",
+        "no_votes",
+        "total_votes",
+        "turnout_percent",
+        "closed_at",
+    )
+    readonly_fields = (
+        "topic",
+        "yes_votes",
+        "no_votes",
+        "total_votes",
+        "eligible_voters",
+        "turnout_percent",
+        "closed_at",
+        "created_at",
+    )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("topic")
+
+    @admin.display(description="Participação")
+    def turnout_percent(self, obj):
+        return f"{obj.turnout:.1%}"
+
+    # Written once by the system, never edited
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
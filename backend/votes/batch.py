@@ -0,0 +1,150 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from topics.cache import invalidate_result
+from topics.models import Topic
+from .models import ResultSnapshot, Vote
+from .serializers import VoteBatchRecordSerializer
+from .tallies import increment_tallies, increment_tally
+
+User = get_user_model()
+
+
+def rejected(index, error):
+    return {"index": index, "status": "rejected", "error": error}
+
+
+def accepted(index):
+    return {"index": index, "status": "accepted"}
+
+
+def in_session_window(topic, cast_at):
+    if not topic.session_started_at or topic.status == "WAITING":
+        return False
+    session_end = topic.session_started_at + timezone.timedelta(
+        minutes=topic.session_duration
+    )
+    return topic.session_started_at <= cast_at < session_end
+
+
+def lock_topics(votes, report):
+    """
+    Locks the topics of ``votes``, as snapshot_result does, and rejects the
+    votes on topics snapshotted since the batch was validated. Returns the
+    votes left to insert; must run inside the insert transaction.
+    """
+    topic_ids = {vote.topic_id for _, vote in votes}
+    # In pk order, so concurrent batches can't deadlock on each other
+    list(
+        Topic.objects.select_for_update(no_key=True)
+        .filter(pk__in=topic_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    final = set(
+        ResultSnapshot.objects.filter(topic_id__in=topic_ids).values_list(
+            "topic_id", flat=True
+        )
+    )
+    remaining = []
+    for index, vote in votes:
+        if vote.topic_id in final:
+            report[index] = rejected(index, "Resultado da pauta já foi apurado")
+        else:
+            remaining.append((index, vote))
+    return remaining
+
+
+def ingest_votes(records):
+    """
+    Validates and stores a batch of ``(topic_id, user_id, vote)`` records.
+
+    Topics, users and prior votes are each loaded with one query for the
+    whole batch, and the accepted votes are written with one bulk INSERT.
+    Returns one accepted/rejected entry per record, in input order.
+    """
+    now = timezone.now()
+    report = [None] * len(records)
+    candidates = []
+
+    for index, record in enumerate(records):
+        serializer = VoteBatchRecordSerializer(data=record)
+        if serializer.is_valid():
+            candidates.append((index, serializer.validated_data))
+        else:
+            report[index] = rejected(index, serializer.errors)
+
+    topic_ids = {data["topic_id"] for _, data in candidates}
+    user_ids = {data["user_id"] for _, data in candidates}
+    topics = Topic.objects.only(
+        "status", "session_started_at", "session_duration"
+    ).in_bulk(topic_ids)
+    final = set(
+        ResultSnapshot.objects.filter(topic_id__in=topic_ids).values_list(
+            "topic_id", flat=True
+        )
+    )
+    active_users = set(
+        User.objects.filter(pk__in=user_ids, is_active=True).values_list(
+            "pk", flat=True
+        )
+    )
+    # Superset of the pairs in the batch, filtered below
+    voted = set(
+        Vote.objects.filter(topic_id__in=topic_ids, user_id__in=user_ids).values_list(
+            "topic_id", "user_id"
+        )
+    )
+
+    to_insert = []
+    for index, data in candidates:
+        topic = topics.get(data["topic_id"])
+        pair = (data["topic_id"], data["user_id"])
+        cast_at = data.get("cast_at", now)
+
+        if topic is None:
+            report[index] = rejected(index, "Pauta não encontrada")
+        elif topic.id in final:
+            report[index] = rejected(index, "Resultado da pauta já foi apurado")
+        elif data["user_id"] not in active_users:
+            report[index] = rejected(index, "Usuário não encontrado")
+        elif cast_at > now or not in_session_window(topic, cast_at):
+            report[index] = rejected(index, "Voto fora da sessão de votação")
+        elif pair in voted:
+            report[index] = rejected(index, "Usuário já votou nesta pauta")
+        else:
+            # Also catches the same voter twice in this batch
+            voted.add(pair)
+            # Stored with when it was cast, not when the batch arrived
+            vote = Vote(
+                topic_id=pair[0], user_id=pair[1], vote=data["vote"], created_at=cast_at
+            )
+            to_insert.append((index, vote))
+
+    try:
+        with transaction.atomic():
+            to_insert = lock_topics(to_insert, report)
+            Vote.objects.bulk_create([vote for _, vote in to_insert])
+            increment_tallies([vote for _, vote in to_insert])
+        inserted = to_insert
+    except IntegrityError:
+        # A concurrent writer beat us to some pairs: fall back to one
+        # savepoint per vote so only the conflicting records are rejected
+        inserted = []
+        for index, vote in to_insert:
+            try:
+                with transaction.atomic():
+                    if not lock_topics([(index, vote)], report):
+                        continue
+                    vote.save(force_insert=True)
+                    increment_tally(vote.topic_id, vote.vote)
+                inserted.append((index, vote))
+            except IntegrityError:
+                report[index] = rejected(index, "Usuário já votou nesta pauta")
+
+    for index, _ in inserted:
+        report[index] = accepted(index)
+    for topic_id in {vote.topic_id for _, vote in inserted}:
+        invalidate_result(topic_id)
+
+    return report
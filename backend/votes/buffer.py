@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from topics.cache import invalidate_result
+from voting_system import metrics
+from .models import PendingVote, Vote
+from .tallies import increment_tallies
+
+
+def enqueue_vote(topic, user, choice):
+    """
+    Records a vote in the write-behind buffer. Must run inside the caller's
+    transaction; raises IntegrityError when the user already voted, either
+    still pending (unique constraint) or already flushed.
+    """
+    pending = PendingVote.objects.create(topic=topic, user=user, vote=choice)
+    # Checked after the insert: a flush committing in between is visible here
+    if Vote.objects.filter(topic=topic, user=user).exists():
+        raise IntegrityError("Vote already recorded for this topic and user")
+    return pending
+
+
+def find_user_vote(topic_id, user):
+    """
+    The user's vote on a topic, flushed or still pending, as
+    ``(choice, pending)``; ``None`` when the user has not voted.
+    """
+    for model, pending in ((Vote, False), (PendingVote, True)):
+        choice = (
+            model.objects.filter(topic_id=topic_id, user=user)
+            .values_list("vote", flat=True)
+            .first()
+        )
+        if choice is not None:
+            return choice, pending
+    return None
+
+
+async def afind_user_votes(topic_ids, user_id):
+    """
+    The user's votes on a set of topics as ``{topic_id: choice}``, with one
+    IN query per table however many topics there are.
+    """
+    models = [PendingVote, Vote] if settings.VOTE_BUFFER_ENABLED else [Vote]
+    votes = {}
+    for model in models:
+        rows = model.objects.filter(user_id=user_id, topic_id__in=topic_ids)
+        async for topic_id, choice in rows.values_list("topic_id", "vote"):
+            votes[topic_id] = choice
+    return votes
+
+
+def flush_pending_votes(batch_size):
+    """
+    Moves up to ``batch_size`` buffered votes into Vote in one transaction.
+    Returns ``(flushed, latency)`` where latency is the age in seconds of
+    the oldest vote in the batch.
+    """
+    with transaction.atomic():
+        batch = list(
+            PendingVote.objects.select_for_update(skip_locked=True).order_by("pk")[
+                :batch_size
+            ]
+        )
+        if not batch:
+            return 0, None
+
+        existing = set(
+            Vote.objects.filter(
+                topic_id__in={p.topic_id for p in batch},
+                user_id__in={p.user_id for p in batch},
+            ).values_list("topic_id", "user_id")
+        )
+        votes = [
+            Vote(
+                topic_id=p.topic_id,
+                user_id=p.user_id,
+                vote=p.vote,
+                created_at=p.created_at,
+            )
+            for p in batch
+            if (p.topic_id, p.user_id) not in existing
+        ]
+        Vote.objects.bulk_create(votes)
+        increment_tallies(votes)
+        PendingVote.objects.filter(pk__in=[p.pk for p in batch]).delete()
+
+    latency = (timezone.now() - min(p.created_at for p in batch)).total_seconds()
+    metrics.incr("vote_buffer.flushed", len(votes))
+    metrics.incr("vote_buffer.flushes")
+    for topic_id in {vote.topic_id for vote in votes}:
+        invalidate_result(topic_id)
+    return len(votes), latency
+
+
+def buffer_stats():
+    stats = PendingVote.objects.aggregate(depth=Count("id"), oldest=Min("created_at"))
+    oldest = stats["oldest"]
+    return {
+        "vote_buffer.depth": stats["depth"],
+        "vote_buffer.oldest_age_seconds": (
+            (timezone.now() - oldest).total_seconds() if oldest else 0
+        ),
+    }
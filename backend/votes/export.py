@@ -0,0 +1,87 @@
+import csv
+import json
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .models import Vote
+
+# Projected straight from the Vote/User join: no model instances are built
+COLUMNS = ("id", "user_id", "user__cpf", "user__name", "vote", "created_at")
+HEADER = ("vote_id", "user_id", "cpf", "name", "vote", "created_at")
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class Echo:
+    """File-like object for csv.writer that hands back each formatted line."""
+
+    def write(self, value):
+        return value
+
+
+def vote_rows(topic_id):
+    return Vote.objects.filter(topic_id=topic_id).order_by("id").values_list(*COLUMNS)
+
+
+def as_record(row):
+    *values, created_at = row
+    return (*values, created_at.isoformat())
+
+
+# Leading characters spreadsheets read as the start of a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def as_csv_record(row):
+    # Names are typed by members: keep them from running as formulas when
+    # the file is opened in a spreadsheet
+    return tuple(
+        (
+            "'" + value
+            if isinstance(value, str) and value.startswith(FORMULA_PREFIXES)
+            else value
+        )
+        for value in as_record(row)
+    )
+
+
+def encoder(export_format):
+    """The header line (or None) and the row encoder of a format."""
+    if export_format == "csv":
+        writer = csv.writer(Echo())
+        return writer.writerow(HEADER), lambda row: writer.writerow(as_csv_record(row))
+    return None, lambda row: json.dumps(dict(zip(HEADER, as_record(row)))) + "\n"
+
+
+def stream_votes(topic_id, export_format, chunk_size=None):
+    """
+    Yields a topic's votes as CSV or NDJSON lines. Rows are read through a
+    server-side cursor ``chunk_size`` at a time, so memory stays flat
+    whatever the number of votes.
+    """
+    header, encode = encoder(export_format)
+    if header is not None:
+        yield header
+    rows = vote_rows(topic_id).iterator(
+        chunk_size=chunk_size or settings.VOTE_EXPORT_CHUNK_SIZE
+    )
+    for row in rows:
+        yield encode(row)
+
+
+async def astream_votes(topic_id, export_format, chunk_size=None):
+    """
+    Async variant of stream_votes, for responses served over ASGI: each
+    chunk of lines is produced in the sync thread.
+    """
+    chunk_size = chunk_size or settings.VOTE_EXPORT_CHUNK_SIZE
+    # values_list().aiterator() runs its query in the event loop on
+    # Django 4.2, so drive the sync iterator a chunk at a time instead
+    lines = stream_votes(topic_id, export_format, chunk_size)
+    next_chunk = sync_to_async(lambda: list(islice(lines, chunk_size)))
+    while chunk := await next_chunk():
+        for line in chunk:
+            yield line
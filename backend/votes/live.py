@@ -0,0 +1,162 @@
+import asyncio
+import json
+import logging
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import Error, close_old_connections
+from topics.models import Topic
+from .tallies import aget_tally
+
+logger = logging.getLogger(__name__)
+
+# One hub per topic per worker process, shared by all its watchers
+_hubs = {}
+
+
+def topic_state(topic, tally):
+    return {
+        "topic_id": topic.id,
+        "topic_status": topic.status,
+        "is_session_active": topic.is_session_active,
+        "total_votes": tally["total"],
+        "yes_votes": tally["yes_votes"],
+        "no_votes": tally["no_votes"],
+    }
+
+
+async def read_state(topic_id):
+    topic = (
+        await Topic.objects.filter(pk=topic_id)
+        .only("status", "session_started_at", "session_duration")
+        .afirst()
+    )
+    if topic is None:
+        return None
+    return topic_state(topic, await aget_tally(topic_id))
+
+
+def format_event(event, data, retry=None):
+    message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    if retry is not None:
+        message = f"retry: {retry}\n" + message
+    return message
+
+
+class TopicHub:
+    """
+    Fans out one topic's tally and status changes to every subscriber.
+
+    A single poller per topic reads the topic and its tally once per
+    LIVE_RESULTS_POLL_INTERVAL and broadcasts what changed, so the database
+    cost does not grow with the number of connected watchers.
+    """
+
+    def __init__(self, topic_id):
+        self.topic_id = topic_id
+        self.subscribers = set()
+        self.state = None
+        self.poller = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=settings.LIVE_RESULTS_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.poller is None:
+            self.poller = asyncio.ensure_future(self.poll())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers:
+            if self.poller is not None:
+                self.poller.cancel()
+            _hubs.pop(self.topic_id, None)
+
+    def publish(self, event, data):
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                # Slow consumer: every event carries absolute totals, so
+                # skipping one only loses the intermediate delta
+                pass
+
+    async def poll(self):
+        while True:
+            try:
+                state = await read_state(self.topic_id)
+            except Error:
+                # E.g. a database restart: keep the hub alive, drop the dead
+                # connection and reconnect on the next tick; watchers get
+                # keepalives meanwhile
+                logger.exception("Live results poll failed for topic %s", self.topic_id)
+                await sync_to_async(close_old_connections)()
+                state = None
+            if state is not None and state != self.state:
+                self.broadcast_changes(self.state, state)
+                self.state = state
+            await asyncio.sleep(settings.LIVE_RESULTS_POLL_INTERVAL)
+
+    def broadcast_changes(self, old, new):
+        if old is None:
+            return
+
+        if new["total_votes"] != old["total_votes"]:
+            self.publish(
+                "tally",
+                dict(
+                    new,
+                    delta={
+                        "YES": new["yes_votes"] - old["yes_votes"],
+                        "NO": new["no_votes"] - old["no_votes"],
+                    },
+                ),
+            )
+
+        if (new["topic_status"], new["is_session_active"]) != (
+            old["topic_status"],
+            old["is_session_active"],
+        ):
+            self.publish("status", new)
+
+
+def get_hub(topic_id):
+    hub = _hubs.get(topic_id)
+    if hub is None:
+        hub = _hubs[topic_id] = TopicHub(topic_id)
+    return hub
+
+
+async def stream_topic(topic_id):
+    """
+    Server-Sent Events stream for one topic: a ``snapshot`` event, then
+    ``tally``/``status`` events until the topic is CLOSED.
+    """
+    hub = get_hub(topic_id)
+    queue = hub.subscribe()
+    try:
+        state = hub.state or await read_state(topic_id)
+        if state is None:
+            return
+
+        yield format_event("snapshot", state, retry=settings.LIVE_RESULTS_RETRY_MS)
+        if state["topic_status"] == "CLOSED":
+            return
+
+        # Bounded lifetime: EventSource reconnects on its own, and a stream
+        # whose client went away is reclaimed at the latest here
+        deadline = time.monotonic() + settings.LIVE_RESULTS_MAX_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                event, data = await asyncio.wait_for(
+                    queue.get(), timeout=settings.LIVE_RESULTS_KEEPALIVE
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            yield format_event(event, data)
+            if data["topic_status"] == "CLOSED":
+                return
+    finally:
+        hub.unsubscribe(queue)
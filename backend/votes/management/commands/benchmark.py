@@ -0,0 +1,326 @@
+import http.client
+import json
+import random
+import statistics
+import time
+import uuid
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+from topics.models import Topic
+from voting_system.instrumentation import collect_queries
+
+User = get_user_model()
+
+BENCHMARK_EMAIL_DOMAIN = "benchmark.invalid"
+BENCHMARK_PASSWORD = "benchmark-pass"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Driver:
+    """
+    Sends requests to the in-process WSGI or ASGI application, or over
+    HTTP to a running server when ``url`` is given.
+    """
+
+    def __init__(self, app, url=None):
+        self.app = app
+        self.url = urlsplit(url) if url else None
+
+    def client(self):
+        if self.url:
+            # One keep-alive connection per worker, like a real client
+            connection_class = (
+                http.client.HTTPSConnection
+                if self.url.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            return connection_class(self.url.netloc, timeout=30)
+        return AsyncClient() if self.app == "asgi" else Client()
+
+    def request(self, client, method, path, data=None, token=None):
+        if self.url:
+            return self.http_request(client, method, path, data, token)
+
+        kwargs = {}
+        if data is not None:
+            kwargs = {"data": json.dumps(data), "content_type": "application/json"}
+        if token:
+            kwargs["headers"] = {"Authorization": f"Bearer {token}"}
+
+        send = getattr(client, method)
+        if self.app == "asgi":
+
+            async def send_async(path, **kwargs):
+                return await getattr(client, method)(path, **kwargs)
+
+            send = async_to_sync(send_async)
+        response = send(path, **kwargs)
+        if response.get("Content-Type") != "application/json":
+            return response.status_code, None
+        return response.status_code, response.json()
+
+    def http_request(self, client, method, path, data, token):
+        headers = {}
+        body = None
+        if data is not None:
+            body = json.dumps(data)
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        path = self.url.path.rstrip("/") + path
+        try:
+            client.request(method.upper(), path, body=body, headers=headers)
+            response = client.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError):
+            # The server closed an idle keep-alive connection: retry once
+            client.close()
+            client.request(method.upper(), path, body=body, headers=headers)
+            response = client.getresponse()
+
+        payload = response.read()
+        if response.getheader("Content-Type") != "application/json":
+            return response.status, None
+        return response.status, json.loads(payload)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests register/login/vote/list/result against the in-process "
+        "WSGI or ASGI app and reports throughput, latency percentiles and "
+        "queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--topics", type=int, default=5)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--reads",
+            type=int,
+            default=500,
+            help="Number of list and result requests each.",
+        )
+        parser.add_argument("--app", choices=["wsgi", "asgi"], default="wsgi")
+        parser.add_argument(
+            "--url",
+            help=(
+                "Send the requests to the server running at this base URL "
+                "instead of the in-process app. The server must use the same "
+                "database; queries per request are then not measured."
+            ),
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the synthetic users, topics and votes.",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["topics"] < 1:
+            raise CommandError("--users and --topics must be at least 1.")
+
+        self.driver = Driver(options["app"], options["url"])
+        self.concurrency = options["concurrency"]
+        self.samples = {}
+        self.walls = {}
+        run_id = uuid.uuid4().hex[:8]
+
+        self.stdout.write(
+            f"Benchmark {run_id}: {options['users']} users, {options['topics']} "
+            f"topics, concurrency {self.concurrency}, "
+            f"{options['url'] or options['app'] + ' app'}"
+        )
+        # The test clients send requests for the "testserver" host, all
+        # from one address: the rate limits would throttle the load itself
+        allowed_hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+        try:
+            with override_settings(ALLOWED_HOSTS=allowed_hosts, THROTTLE_RATES={}):
+                self.run_scenario(run_id, options)
+        finally:
+            if not options["keep"]:
+                self.cleanup()
+
+        report = self.build_report(run_id, options)
+        self.print_report(report)
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def run_scenario(self, run_id, options):
+        cpfs = self.run_phase(
+            "register",
+            [self.register_call(run_id, i) for i in range(options["users"])],
+        )
+        tokens = self.run_phase("login", [self.login_call(cpf) for cpf in cpfs])
+        if not tokens:
+            raise CommandError("No synthetic user could log in.")
+
+        topics = self.create_topics(run_id, options["topics"])
+        self.run_phase(
+            "vote",
+            [
+                self.vote_call(topic_id, token)
+                for token in tokens
+                for topic_id in topics
+            ],
+        )
+        self.run_phase(
+            "list", [self.get_call("/topics") for _ in range(options["reads"])]
+        )
+        self.run_phase(
+            "result",
+            [
+                self.get_call(f"/topics/{random.choice(topics)}/result")
+                for _ in range(options["reads"])
+            ],
+        )
+
+    # Calls return (expected status codes, method, path, data, token, extract)
+
+    def register_call(self, run_id, index):
+        cpf = f"9{random.randrange(10**10):010d}"
+        data = {
+            "name": f"Benchmark {run_id} {index}",
+            "cpf": cpf,
+            "email": f"{run_id}-{index}@{BENCHMARK_EMAIL_DOMAIN}",
+            "password": BENCHMARK_PASSWORD,
+        }
+        return ((201,), "post", "/register", data, None, lambda body: cpf)
+
+    def login_call(self, cpf):
+        data = {"cpf": cpf, "password": BENCHMARK_PASSWORD}
+        return ((200,), "post", "/login", data, None, lambda body: body["token"])
+
+    def vote_call(self, topic_id, token):
+        data = {"vote": random.choice(["YES", "NO"])}
+        path = f"/topics/{topic_id}/vote"
+        return ((201, 202), "post", path, data, token, None)
+
+    def get_call(self, path):
+        return ((200,), "get", path, None, None, None)
+
+    def create_topics(self, run_id, count):
+        author = User.objects.filter(email__endswith=BENCHMARK_EMAIL_DOMAIN).first()
+        topics = Topic.objects.bulk_create(
+            Topic(
+                title=f"Benchmark {run_id} {i}",
+                description="Pauta sintética de benchmark",
+                created_by=author,
+                status="OPEN",
+                session_started_at=timezone.now(),
+                session_duration=60,
+            )
+            for i in range(count)
+        )
+        return [topic.pk for topic in topics]
+
+    def run_phase(self, name, calls):
+        samples = self.samples[name] = []
+        results = []
+
+        def worker(chunk):
+            client = self.driver.client()
+            try:
+                for expected, method, path, data, token, extract in chunk:
+                    with collect_queries() as queries:
+                        start = time.perf_counter()
+                        code, body = self.driver.request(
+                            client, method, path, data, token
+                        )
+                        elapsed = time.perf_counter() - start
+                    ok = code in expected
+                    # Over HTTP the queries run in the server process
+                    count = None if self.driver.url else queries.count
+                    samples.append((elapsed, count, ok))
+                    if ok and extract:
+                        results.append(extract(body))
+            finally:
+                if self.driver.url:
+                    client.close()
+                close_old_connections()
+                connection.close()
+
+        chunks = [calls[i :: self.concurrency] for i in range(self.concurrency)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(worker, chunks))
+        self.walls[name] = time.perf_counter() - start
+
+        errors = sum(1 for _, _, ok in samples if not ok)
+        self.stdout.write(f"  {name}: {len(samples)} requests, {errors} errors")
+        return results
+
+    def build_report(self, run_id, options):
+        endpoints = {}
+        for name in ("register", "login", "vote", "list", "result"):
+            samples = self.samples.get(name)
+            if not samples:
+                continue
+            latencies = [elapsed * 1000 for elapsed, _, _ in samples]
+            wall = self.walls[name]
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": sum(1 for _, _, ok in samples if not ok),
+                "throughput_rps": round(len(samples) / wall, 2) if wall else None,
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p95_ms": round(percentile(latencies, 95), 3),
+                "p99_ms": round(percentile(latencies, 99), 3),
+                "mean_ms": round(statistics.mean(latencies), 3),
+                "queries_per_request": (
+                    None
+                    if self.driver.url
+                    else round(statistics.mean(count for _, count, _ in samples), 2)
+                ),
+            }
+
+        return {
+            "run_id": run_id,
+            "created_at": timezone.now().isoformat(),
+            "config": {
+                "app": "http" if options["url"] else options["app"],
+                "url": options["url"],
+                "users": options["users"],
+                "topics": options["topics"],
+                "concurrency": options["concurrency"],
+                "reads": options["reads"],
+                "database": connection.vendor,
+                "vote_buffer": settings.VOTE_BUFFER_ENABLED,
+            },
+            "endpoints": endpoints,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{'endpoint':<10}{'reqs':>7}{'errs':>6}{'rps':>10}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'q/req':>8}"
+        )
+        for name, stats in report["endpoints"].items():
+            queries = stats["queries_per_request"]
+            self.stdout.write(
+                f"{name:<10}{stats['requests']:>7}{stats['errors']:>6}"
+                f"{stats['throughput_rps']:>10}{stats['p50_ms']:>10}"
+                f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+                f"{'-' if queries is None else queries:>8}"
+            )
+
+    def cleanup(self):
+        # Topics and votes go with their users through ON DELETE CASCADE
+        deleted, _ = User.objects.filter(
+            email__endswith=f"@{BENCHMARK_EMAIL_DOMAIN}"
+        ).delete()
+        self.stdout.write(f"Removed {deleted} synthetic rows.")
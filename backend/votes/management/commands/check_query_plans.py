@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from topics.models import Topic
+from votes.models import Vote
+from votes.tallies import tally_rows
+
+
+def hot_queries():
+    """
+    The hot read paths, each with the indexes its plan may use.
+    Parameter values are placeholders: only the plan shape matters.
+    """
+    newest = ("-created_at", "-id")
+    return [
+        (
+            "topic listing",
+            Topic.objects.order_by(*newest)[:21],
+            ["topic_newest_idx"],
+        ),
+        (
+            "topic listing by status",
+            Topic.objects.filter(status="CLOSED").order_by(*newest)[:21],
+            ["topic_status_newest_idx"],
+        ),
+        (
+            "open sessions",
+            Topic.objects.expired(),
+            ["topic_open_session_idx", "topic_status_newest_idx"],
+        ),
+        (
+            "topic tally",
+            tally_rows(0),
+            # Django's name for the (topic, choice, shard) unique index
+            ["votes_tallyshard_topic_id_choice_shard"],
+        ),
+        (
+            "snapshot vote count",
+            Vote.objects.filter(topic_id=0)
+            .values("topic_id")
+            .annotate(
+                total=Count("vote"),
+                yes_votes=Count("vote", filter=Q(vote="YES")),
+            ),
+            ["vote_topic_choice_idx"],
+        ),
+        (
+            "user vote history",
+            Vote.objects.filter(user_id=0).order_by(*newest)[:21],
+            ["vote_user_history_idx"],
+        ),
+    ]
+
+
+def explain(queryset):
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # Small tables are scanned sequentially whatever the indexes;
+            # this shows the plan the planner picks once they grow
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN on the hot queries and fails if one misses its index."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print the full plan of every query.",
+        )
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, queryset, indexes in hot_queries():
+            plan = explain(queryset)
+            used = next((index for index in indexes if index in plan), None)
+            if used:
+                self.stdout.write(f"{name}: {used}")
+            else:
+                self.stdout.write(f"{name}: no expected index")
+                failures.append(name)
+            if options["verbose_plans"] or not used:
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"Index not used by: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All hot queries use their indexes."))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from topics.models import Topic
+from votes.export import CONTENT_TYPES, stream_votes
+
+
+class Command(BaseCommand):
+    help = "Streams every vote of a topic as CSV or NDJSON, for audits."
+
+    def add_arguments(self, parser):
+        parser.add_argument("topic_id", type=int)
+        parser.add_argument(
+            "--format",
+            choices=sorted(CONTENT_TYPES),
+            default="csv",
+            dest="export_format",
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write to; defaults to standard output.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Rows fetched per round trip (default VOTE_EXPORT_CHUNK_SIZE).",
+        )
+
+    def handle(self, *args, **options):
+        topic_id = options["topic_id"]
+        if not Topic.objects.filter(pk=topic_id).exists():
+            raise CommandError(f"Topic {topic_id} does not exist.")
+
+        lines = stream_votes(topic_id, options["export_format"], options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as output:
+                count = self.write_lines(output, lines)
+            self.stdout.write(f"{count} line(s) written to {options['output']}.")
+        else:
+            self.write_lines(self.stdout, lines)
+
+    def write_lines(self, output, lines):
+        count = 0
+        for line in lines:
+            output.write(line)
+            count += 1
+        return count
@@ -0,0 +1,69 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+from votes.buffer import buffer_stats, flush_pending_votes
+
+
+class Command(BaseCommand):
+    help = "Moves buffered votes into the Vote table, once or with --loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and flush the buffer every interval.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.VOTE_BUFFER_FLUSH_INTERVAL,
+            help="Seconds to wait when the buffer is empty (with --loop).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.VOTE_BUFFER_BATCH_SIZE,
+            help="Maximum number of votes moved per transaction.",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Only print the buffer depth and oldest vote age.",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for name, value in buffer_stats().items():
+                self.stdout.write(f"{name}: {value}")
+            return
+
+        if not options["loop"]:
+            while self.flush(options["batch_size"]):
+                pass
+            return
+
+        self.stdout.write(
+            f"Flushing vote buffer every {options['interval']} seconds..."
+        )
+        try:
+            while True:
+                try:
+                    # Drain back to back while there is a backlog
+                    while self.flush(options["batch_size"]):
+                        pass
+                except DatabaseError as exc:
+                    self.stderr.write(f"Flush failed: {exc}")
+                finally:
+                    close_old_connections()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Flusher stopped.")
+
+    def flush(self, batch_size):
+        flushed, latency = flush_pending_votes(batch_size)
+        if latency is None:
+            return False
+
+        self.stdout.write(f"{flushed} vote(s) flushed, oldest waited {latency:.3f}s.")
+        return True
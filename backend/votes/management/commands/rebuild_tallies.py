@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from votes.tallies import rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the denormalized topic vote counters from the Vote rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--topic",
+            type=int,
+            action="append",
+            dest="topic_ids",
+            help="Only reconcile the given topic id (can be repeated).",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report mismatches, do not fix them.",
+        )
+
+    def handle(self, *args, **options):
+        mismatches = rebuild_tallies(
+            topic_ids=options["topic_ids"], dry_run=options["check"]
+        )
+
+        for topic_id, stored, actual in mismatches:
+            self.stdout.write(f"Topic {topic_id}: stored {stored} != counted {actual}")
+
+        if options["check"]:
+            self.stdout.write(f"{len(mismatches)} topic(s) out of sync.")
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"{len(mismatches)} topic(s) reconciled.")
+            )
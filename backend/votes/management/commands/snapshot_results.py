@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from votes.snapshots import snapshot_closed_topics
+
+
+class Command(BaseCommand):
+    help = "Writes the final result snapshot of closed topics that lack one."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--topic",
+            type=int,
+            action="append",
+            dest="topic_ids",
+            help="Only snapshot the given topic id (can be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        snapshotted = snapshot_closed_topics(topic_ids=options["topic_ids"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(snapshotted)} result(s) snapshotted.")
+        )
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from topics.models import Topic
 
 User = get_user_model()
@@ -14,12 +15,100 @@ class Vote(models.Model):
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name="votes")
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     vote = models.CharField(max_length=3, choices=VOTE_CHOICES)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: votes flushed from the buffer keep their cast time
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         unique_together = ["topic", "user"]  # One vote per user per topic
         verbose_name = "Voto"
         verbose_name_plural = "Votos"
+        indexes = [
+            # Covers per-topic tallies: COUNT(*) grouped/filtered by vote
+            models.Index(fields=["topic", "vote"], name="vote_topic_choice_idx"),
+            # A user's vote history, newest first
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="vote_user_history_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.name} - {self.topic.title} - {self.get_vote_display()}"
+
+
+class TallyShard(models.Model):
+    """
+    One of a topic's counters for a vote option. Each vote increments a
+    random shard, so concurrent votes on a hot topic update different rows;
+    the tally is the sum of the shards.
+    """
+
+    topic = models.ForeignKey(
+        Topic, on_delete=models.CASCADE, related_name="tally_counters"
+    )
+    choice = models.CharField(max_length=3, choices=Vote.VOTE_CHOICES)
+    shard = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ["topic", "choice", "shard"]
+        verbose_name = "Contador de votos"
+        verbose_name_plural = "Contadores de votos"
+
+    def __str__(self):
+        return f"{self.topic_id} - {self.choice} #{self.shard}: {self.count}"
+
+
+class PendingVote(models.Model):
+    """
+    Vote accepted in buffered mode and not yet flushed to Vote.
+    Rows are moved to Vote in batches by the flush_vote_buffer command.
+    """
+
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    vote = models.CharField(max_length=3, choices=Vote.VOTE_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        unique_together = ["topic", "user"]
+        verbose_name = "Voto pendente"
+        verbose_name_plural = "Votos pendentes"
+
+    def __str__(self):
+        return f"{self.user_id} - {self.topic_id} - {self.get_vote_display()}"
+
+
+class ResultSnapshot(models.Model):
+    """
+    Final result of a closed topic, written once when its session closes
+    (see votes.snapshots). Closed results are read from here instead of
+    the counters.
+    """
+
+    topic = models.OneToOneField(
+        Topic,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="result_snapshot",
+    )
+    yes_votes = models.PositiveIntegerField()
+    no_votes = models.PositiveIntegerField()
+    total_votes = models.PositiveIntegerField()
+    # Active members when the snapshot was taken
+    eligible_voters = models.PositiveIntegerField()
+    closed_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Resultado final"
+        verbose_name_plural = "Resultados finais"
+
+    @property
+    def turnout(self):
+        """Share of the eligible members who voted, from 0 to 1."""
+        if not self.eligible_voters:
+            return 0.0
+        return self.total_votes / self.eligible_voters
+
+    def __str__(self):
+        return f"{self.topic_id}: {self.yes_votes} x {self.no_votes}"
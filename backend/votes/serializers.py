@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Vote
 
@@ -20,10 +21,36 @@ class VoteSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "user", "created_at"]
 
 
+class UserVoteSerializer(serializers.Serializer):
+    """A row of the user's vote history, from a .values() projection."""
+
+    id = serializers.IntegerField()
+    topic_id = serializers.IntegerField()
+    topic_title = serializers.CharField(source="topic__title")
+    vote = serializers.CharField()
+    created_at = serializers.DateTimeField()
+
+
 class VoteCreateSerializer(serializers.Serializer):
     vote = serializers.ChoiceField(choices=Vote.VOTE_CHOICES)
 
 
+class VoteBatchSerializer(serializers.Serializer):
+    votes = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.VOTE_BATCH_MAX_SIZE,
+    )
+
+
+class VoteBatchRecordSerializer(serializers.Serializer):
+    topic_id = serializers.IntegerField()
+    user_id = serializers.IntegerField()
+    vote = serializers.ChoiceField(choices=Vote.VOTE_CHOICES)
+    # When the kiosk collected the vote; defaults to the time of ingestion
+    cast_at = serializers.DateTimeField(required=False)
+
+
 class TopicResultSerializer(serializers.Serializer):
     topic_id = serializers.IntegerField()
     topic_title = serializers.CharField()
@@ -33,3 +60,6 @@ class TopicResultSerializer(serializers.Serializer):
     yes_votes = serializers.IntegerField()
     no_votes = serializers.IntegerField()
     results = serializers.DictField()
+    # Set once the result is final (votes.ResultSnapshot)
+    turnout = serializers.FloatField(allow_null=True)
+    closed_at = serializers.DateTimeField(allow_null=True)
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from topics.cache import invalidate_result
+from topics.models import Topic
+from .models import PendingVote, ResultSnapshot
+from .tallies import count_votes
+
+User = get_user_model()
+
+
+def closed_at(topic):
+    """When the session ended: its scheduled end, or earlier if closed early."""
+    if not topic.session_started_at:
+        return topic.updated_at
+    session_end = topic.session_started_at + timezone.timedelta(
+        minutes=topic.session_duration
+    )
+    return min(session_end, topic.updated_at)
+
+
+def snapshot_result(topic, eligible_voters=None):
+    """
+    Writes the final result of a CLOSED topic, once. Returns the snapshot,
+    or None while buffered votes for the topic are still waiting to be
+    flushed.
+
+    Holds the topic's row lock, like the batch import does while inserting,
+    so no vote lands between the count and the snapshot.
+    """
+    if eligible_voters is None:
+        eligible_voters = User.objects.filter(is_active=True).count()
+
+    with transaction.atomic():
+        list(
+            Topic.objects.select_for_update(no_key=True)
+            .filter(pk=topic.id)
+            .values_list("pk", flat=True)
+        )
+        if PendingVote.objects.filter(topic_id=topic.id).exists():
+            return None
+
+        # Counted from the Vote rows, so counter drift never becomes final
+        tally = count_votes(topic.id)
+        snapshot, _ = ResultSnapshot.objects.get_or_create(
+            topic_id=topic.id,
+            defaults={
+                "yes_votes": tally["yes_votes"],
+                "no_votes": tally["no_votes"],
+                "total_votes": tally["total"],
+                "eligible_voters": eligible_voters,
+                "closed_at": closed_at(topic),
+            },
+        )
+    return snapshot
+
+
+def snapshot_closed_topics(topic_ids=None):
+    """
+    Snapshots the CLOSED topics that have none yet and no pending votes.
+    Returns the ids of the topics snapshotted.
+    """
+    topics = (
+        Topic.objects.filter(status="CLOSED", result_snapshot__isnull=True)
+        .exclude(pk__in=PendingVote.objects.values("topic_id"))
+        .only("status", "session_started_at", "session_duration", "updated_at")
+        .order_by("pk")
+    )
+    if topic_ids is not None:
+        topics = topics.filter(pk__in=topic_ids)
+
+    snapshotted = []
+    eligible_voters = User.objects.filter(is_active=True).count()
+    for topic in topics.iterator():
+        if snapshot_result(topic, eligible_voters) is not None:
+            snapshotted.append(topic.id)
+            # The cached result was built before the snapshot existed
+            invalidate_result(topic.id)
+    return snapshotted
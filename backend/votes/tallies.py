@@ -0,0 +1,177 @@
+import random
+from collections import Counter
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from topics.cache import invalidate_result
+from topics.models import Topic
+from .models import TallyShard, Vote
+
+
+def increment_tally(topic_id, choice, amount=1, shards=None):
+    """
+    Adds ``amount`` votes for ``choice`` to one random shard of the topic's
+    counter, so concurrent votes rarely wait on the same row lock.
+    ``shards`` is the topic's tally_shards, looked up when not given.
+
+    Must run inside the same transaction as the Vote insert so the
+    counters never drift from the Vote rows.
+    """
+    if shards is None:
+        shards = Topic.objects.values_list("tally_shards", flat=True).get(pk=topic_id)
+
+    shard = random.randrange(shards)
+    counter = TallyShard.objects.filter(topic_id=topic_id, choice=choice, shard=shard)
+    if counter.update(count=F("count") + amount):
+        return
+
+    # First vote on this shard: create the row, unless another vote just did
+    try:
+        with transaction.atomic():
+            TallyShard.objects.create(
+                topic_id=topic_id, choice=choice, shard=shard, count=amount
+            )
+    except IntegrityError:
+        counter.update(count=F("count") + amount)
+
+
+def increment_tallies(votes):
+    """Bulk variant of increment_tally: one UPDATE per (topic, choice)."""
+    counts = Counter((vote.topic_id, vote.vote) for vote in votes)
+    shards = dict(
+        Topic.objects.filter(pk__in={topic_id for topic_id, _ in counts}).values_list(
+            "pk", "tally_shards"
+        )
+    )
+    for (topic_id, choice), amount in counts.items():
+        increment_tally(topic_id, choice, amount, shards[topic_id])
+
+
+def tally_rows(topic_id):
+    return (
+        TallyShard.objects.filter(topic_id=topic_id)
+        .values("choice")
+        .annotate(votes=Sum("count"))
+        .order_by()
+    )
+
+
+def summarize(rows):
+    totals = {row["choice"]: row["votes"] for row in rows}
+    yes_votes, no_votes = totals.get("YES", 0), totals.get("NO", 0)
+    return {
+        "total": yes_votes + no_votes,
+        "yes_votes": yes_votes,
+        "no_votes": no_votes,
+    }
+
+
+def get_tally(topic_id):
+    """The topic's tally, summed over its counter shards."""
+    return summarize(tally_rows(topic_id))
+
+
+async def aget_tally(topic_id):
+    return summarize([row async for row in tally_rows(topic_id)])
+
+
+def count_votes(topic_id):
+    # Counts only touch columns in the (topic, vote) index
+    counts = Vote.objects.filter(topic_id=topic_id).aggregate(
+        total=Count("vote"),
+        yes_votes=Count("vote", filter=Q(vote="YES")),
+        no_votes=Count("vote", filter=Q(vote="NO")),
+    )
+    return {key: value or 0 for key, value in counts.items()}
+
+
+def counted(queryset, aggregate):
+    """Per-topic aggregate of ``queryset``, as a subquery on the topic row."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(topic_id=OuterRef("pk"))
+            .order_by()
+            .values("topic_id")
+            .annotate(total=aggregate)
+            .values("total")
+        ),
+        0,
+    )
+
+
+def tally_and_votes(topic_id):
+    """
+    The topic's stored tally and its actual vote counts, read in a single
+    statement so both see the same snapshot: a vote and its counter
+    increment commit together, so either both are counted or neither.
+    """
+    columns = {}
+    for choice, key in (("YES", "yes_votes"), ("NO", "no_votes")):
+        columns[f"stored_{key}"] = counted(
+            TallyShard.objects.filter(choice=choice), Sum("count")
+        )
+        columns[f"actual_{key}"] = counted(
+            Vote.objects.filter(vote=choice), Count("id")
+        )
+    row = Topic.objects.filter(pk=topic_id).values(**columns).get()
+
+    def tally(prefix):
+        yes_votes, no_votes = row[f"{prefix}_yes_votes"], row[f"{prefix}_no_votes"]
+        return {
+            "total": yes_votes + no_votes,
+            "yes_votes": yes_votes,
+            "no_votes": no_votes,
+        }
+
+    return tally("stored"), tally("actual")
+
+
+def correct_tally(topic_id, choice, delta):
+    """Adds ``delta`` (possibly negative) to a choice's counters."""
+    if delta > 0:
+        increment_tally(topic_id, choice, delta, shards=1)
+        return
+    # Take the surplus off the shards, which hold at least that much
+    counters = TallyShard.objects.select_for_update().filter(
+        topic_id=topic_id, choice=choice, count__gt=0
+    )
+    for counter in counters.order_by("-count"):
+        taken = min(-delta, counter.count)
+        TallyShard.objects.filter(pk=counter.pk).update(count=F("count") - taken)
+        delta += taken
+        if not delta:
+            break
+
+
+def rebuild_tallies(topic_ids=None, dry_run=False):
+    """
+    Recounts the Vote rows of each topic and fixes counters that drifted.
+
+    The drift is applied as a delta, so votes landing meanwhile, counted
+    or not by the recount, are neither lost nor counted twice, and voting
+    does not have to stop.
+
+    Returns the list of ``(topic_id, stored, actual)`` mismatches found.
+    """
+    topics = Topic.objects.order_by("pk")
+    if topic_ids is not None:
+        topics = topics.filter(pk__in=topic_ids)
+
+    mismatches = []
+    for topic_id in topics.values_list("pk", flat=True).iterator():
+        stored, actual = tally_and_votes(topic_id)
+        if stored == actual:
+            continue
+
+        mismatches.append((topic_id, stored, actual))
+        if not dry_run:
+            with transaction.atomic():
+                for choice, key in (("YES", "yes_votes"), ("NO", "no_votes")):
+                    if actual[key] != stored[key]:
+                        correct_tally(topic_id, choice, actual[key] - stored[key])
+
+    if not dry_run:
+        for topic_id, _, _ in mismatches:
+            invalidate_result(topic_id)
+
+    return mismatches
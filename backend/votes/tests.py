@@ -1,9 +1,36 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import tempfile
+from io import StringIO
+from unittest import mock, skipIf
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import (
+    AsyncClient,
+    LiveServerTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
+from topics.cache import cache_timeout, get_cache, invalidate_topic, result_key
 from topics.models import Topic
-from .models import Vote
+from users.authentication import UserRefreshToken
+from voting_system import metrics
+from . import batch
+from .export import HEADER
+from .live import _hubs as live_hubs, get_hub, stream_topic
+from .models import PendingVote, ResultSnapshot, TallyShard, Vote
+from .snapshots import snapshot_result
+from .tallies import get_tally, increment_tally
 from django.utils import timezone
 
 User = get_user_model()
@@ -47,6 +74,7 @@ class VoteModelTest(TestCase):
 
 class VoteAPITest(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(
             cpf="12345678901",
             name="Test User",
@@ -103,10 +131,928 @@ class VoteAPITest(TestCase):
 
     def test_result_public(self):
         # Votar YES e NO
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.vote_url, {"vote": "YES"})
+        self.client.force_authenticate(user=self.other_user)
+        self.client.post(self.vote_url, {"vote": "NO"})
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.result_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["total_votes"], 2)
+        self.assertEqual(response.json()["yes_votes"], 1)
+        self.assertEqual(response.json()["no_votes"], 1)
+
+    def test_vote_updates_topic_tallies(self):
+        self.client.force_authenticate(user=self.other_user)
+        self.client.post(self.vote_url, {"vote": "YES"})
+        self.assertEqual(
+            get_tally(self.topic.id), {"total": 1, "yes_votes": 1, "no_votes": 0}
+        )
+
+    def test_rejected_vote_does_not_change_tallies(self):
+        self.client.force_authenticate(user=self.other_user)
+        self.client.post(self.vote_url, {"vote": "YES"})
+        self.client.post(self.vote_url, {"vote": "NO"})
+        self.assertEqual(
+            get_tally(self.topic.id), {"total": 1, "yes_votes": 1, "no_votes": 0}
+        )
+
+
+class ResultCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.topic = Topic.objects.create(
+            title="Pauta",
+            description="desc",
+            created_by=self.user,
+            status="OPEN",
+            session_started_at=timezone.now(),
+        )
+        self.client = APIClient()
+        self.vote_url = f"/topics/{self.topic.id}/vote"
+        self.result_url = f"/topics/{self.topic.id}/result"
+
+    def test_result_served_from_cache(self):
+        self.client.get(self.result_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.result_url)
+        self.assertEqual(response.json()["total_votes"], 0)
+        self.assertEqual(metrics.snapshot()["topic_cache.result.hits"], 1)
+        self.assertEqual(metrics.snapshot()["topic_cache.result.misses"], 1)
+
+    def test_vote_invalidates_cached_result(self):
+        self.client.get(self.result_url)
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.vote_url, {"vote": "YES"})
+        response = self.client.get(self.result_url)
+        self.assertEqual(response.json()["total_votes"], 1)
+
+    def test_closed_result_cached_without_expiry(self):
+        self.topic.status = "CLOSED"
+        self.topic.save()
+        self.assertIsNone(cache_timeout(self.topic))
+        self.client.get(self.result_url)
+        self.assertIsNotNone(get_cache().get(result_key(self.topic.id)))
+
+    @override_settings(TOPIC_CACHE_TIMEOUT=0)
+    def test_closed_result_without_snapshot_expires(self):
+        self.topic.status = "CLOSED"
+        self.topic.save()
+        self.client.get(self.result_url)
+        self.assertIsNone(get_cache().get(result_key(self.topic.id)))
+
+        call_command("snapshot_results", stdout=StringIO())
+        self.client.get(self.result_url)
+        self.assertIsNotNone(get_cache().get(result_key(self.topic.id)))
+
+    def test_result_conditional_get(self):
+        etag = self.client.get(self.result_url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.result_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.vote_url, {"vote": "YES"})
+        response = self.client.get(self.result_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_closed_result_is_shared(self):
+        self.topic.status = "CLOSED"
+        self.topic.save()
+        call_command("snapshot_results", stdout=StringIO())
+        response = self.client.get(self.result_url)
+        self.assertEqual(response["Cache-Control"], "public, no-cache")
+
+    def test_editing_topic_changes_result_etag(self):
+        self.topic.status = "CLOSED"
+        self.topic.save()
+        call_command("snapshot_results", stdout=StringIO())
+        etag = self.client.get(self.result_url)["ETag"]
+
+        # As the admin does: save, then drop the cached payloads
+        self.topic.title = "Novo título"
+        self.topic.save()
+        invalidate_topic(self.topic.id)
+        response = self.client.get(self.result_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["topic_title"], "Novo título")
+
+    @override_settings(VOTE_BUFFER_ENABLED=True)
+    def test_closed_result_with_pending_votes_is_revalidated(self):
+        PendingVote.objects.create(topic=self.topic, user=self.user, vote="YES")
+        self.topic.status = "CLOSED"
+        self.topic.save()
+        response = self.client.get(self.result_url)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+    def test_scheduler_close_invalidates_result(self):
+        self.client.get(self.result_url)
+        Topic.objects.filter(pk=self.topic.pk).update(
+            session_started_at=timezone.now() - timezone.timedelta(minutes=61)
+        )
+        call_command("close_expired_sessions", stdout=StringIO())
+        response = self.client.get(self.result_url)
+        self.assertEqual(response.json()["topic_status"], "CLOSED")
+
+    def test_metrics_endpoint_requires_staff(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        self.client.get(self.result_url)
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["topic_cache.result.misses"], 1)
+
+
+class ResultSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.other_user = User.objects.create_user(
+            cpf="98765432100",
+            name="Other User",
+            email="other@example.com",
+            password="otherpass123",
+        )
+        self.topic = Topic.objects.create(
+            title="Pauta",
+            description="desc",
+            created_by=self.user,
+            status="OPEN",
+            session_started_at=timezone.now() - timezone.timedelta(minutes=61),
+        )
         Vote.objects.create(topic=self.topic, user=self.user, vote="YES")
-        Vote.objects.create(topic=self.topic, user=self.other_user, vote="NO")
+        increment_tally(self.topic.id, "YES")
+        self.result_url = f"/topics/{self.topic.id}/result"
+
+    def test_scheduler_snapshots_closed_sessions(self):
+        out = StringIO()
+        call_command("close_expired_sessions", stdout=out)
+        self.assertIn("1 result(s) snapshotted", out.getvalue())
+
+        snapshot = ResultSnapshot.objects.get(topic=self.topic)
+        self.assertEqual(snapshot.yes_votes, 1)
+        self.assertEqual(snapshot.total_votes, 1)
+        self.assertEqual(snapshot.eligible_voters, 2)
+        self.assertEqual(snapshot.turnout, 0.5)
+        self.assertEqual(
+            snapshot.closed_at,
+            self.topic.session_started_at + timezone.timedelta(minutes=60),
+        )
+
+        # Written once: later ticks leave it alone
+        out = StringIO()
+        call_command("close_expired_sessions", stdout=out)
+        self.assertNotIn("snapshotted", out.getvalue())
+
+    def test_closed_result_read_from_snapshot(self):
+        call_command("close_expired_sessions", stdout=StringIO())
+        # Counters no longer matter once the result is final
+        TallyShard.objects.filter(topic=self.topic).delete()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.result_url)
+        self.assertEqual(response.json()["yes_votes"], 1)
+        self.assertEqual(response.json()["turnout"], 0.5)
+        self.assertEqual(response["Cache-Control"], "public, no-cache")
+
+    def test_result_read_does_not_snapshot(self):
+        Topic.objects.filter(pk=self.topic.pk).update(status="CLOSED")
         response = self.client.get(self.result_url)
+        self.assertEqual(response.json()["total_votes"], 1)
+        self.assertIsNone(response.json()["turnout"])
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+        # The scheduler's snapshot replaces the cached, provisional result
+        call_command("snapshot_results", stdout=StringIO())
+        response = self.client.get(self.result_url)
+        self.assertEqual(response.json()["turnout"], 0.5)
+
+    def test_pending_votes_delay_snapshot(self):
+        PendingVote.objects.create(topic=self.topic, user=self.other_user, vote="NO")
+        call_command("close_expired_sessions", stdout=StringIO())
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+        call_command("flush_vote_buffer", stdout=StringIO())
+        call_command("close_expired_sessions", stdout=StringIO())
+        self.assertEqual(ResultSnapshot.objects.get().no_votes, 1)
+
+    def test_backfill_command(self):
+        Topic.objects.filter(pk=self.topic.pk).update(status="CLOSED")
+        out = StringIO()
+        call_command("snapshot_results", stdout=out)
+        self.assertIn("1 result(s) snapshotted", out.getvalue())
+        self.assertEqual(ResultSnapshot.objects.get().total_votes, 1)
+
+    def test_batch_rejects_votes_on_final_results(self):
+        call_command("close_expired_sessions", stdout=StringIO())
+        self.other_user.is_staff = True
+        self.other_user.save()
+        client = APIClient()
+        client.force_authenticate(user=self.other_user)
+        record = {
+            "topic_id": self.topic.id,
+            "user_id": self.other_user.id,
+            "vote": "NO",
+            "cast_at": (
+                self.topic.session_started_at + timezone.timedelta(minutes=1)
+            ).isoformat(),
+        }
+        response = client.post("/votes/batch", {"votes": [record]}, format="json")
+        self.assertEqual(response.data["rejected"], 1)
+        self.assertEqual(ResultSnapshot.objects.get().no_votes, 0)
+
+
+@override_settings(VOTE_BUFFER_ENABLED=True)
+class VoteBufferTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.topic = Topic.objects.create(
+            title="Pauta",
+            description="desc",
+            created_by=self.user,
+            status="OPEN",
+            session_started_at=timezone.now(),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.vote_url = f"/topics/{self.topic.id}/vote"
+        self.my_vote_url = f"/topics/{self.topic.id}/my-vote"
+
+    def test_vote_is_queued_and_acknowledged(self):
+        response = self.client.post(self.vote_url, {"vote": "YES"})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(response.data["vote"]["pending"])
+        self.assertEqual(PendingVote.objects.count(), 1)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_voter_reads_own_pending_vote(self):
+        response = self.client.get(self.my_vote_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.post(self.vote_url, {"vote": "NO"})
+        response = self.client.get(self.my_vote_url)
+        self.assertEqual(response.data["vote"], "NO")
+        self.assertTrue(response.data["pending"])
+
+    def test_duplicate_detected_before_and_after_flush(self):
+        self.client.post(self.vote_url, {"vote": "YES"})
+        response = self.client.post(self.vote_url, {"vote": "NO"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        call_command("flush_vote_buffer", stdout=StringIO())
+        response = self.client.post(self.vote_url, {"vote": "NO"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PendingVote.objects.exists())
+        self.assertEqual(Vote.objects.get().vote, "YES")
+
+    def test_flush_moves_votes_and_updates_tallies(self):
+        self.client.post(self.vote_url, {"vote": "YES"})
+        queued_at = PendingVote.objects.get().created_at
+        out = StringIO()
+        call_command("flush_vote_buffer", stdout=out)
+        self.assertIn("1 vote(s) flushed", out.getvalue())
+
+        vote = Vote.objects.get()
+        self.assertEqual(vote.created_at, queued_at)
+        self.assertEqual(get_tally(self.topic.id)["yes_votes"], 1)
+        response = self.client.get(self.my_vote_url)
+        self.assertFalse(response.data["pending"])
+
+    def test_buffer_depth_is_observable(self):
+        self.client.post(self.vote_url, {"vote": "YES"})
+        out = StringIO()
+        call_command("flush_vote_buffer", "--stats", stdout=out)
+        self.assertIn("vote_buffer.depth: 1", out.getvalue())
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get("/metrics")
+        self.assertEqual(response.data["vote_buffer.depth"], 1)
+
+
+class VoteBatchAPITest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            cpf="00000000000",
+            name="Admin",
+            email="admin@example.com",
+            password="adminpass123",
+        )
+        self.voters = [
+            User.objects.create_user(
+                cpf=f"1111111110{i}", name=f"Voter {i}", email=f"voter{i}@example.com"
+            )
+            for i in range(10)
+        ]
+        self.topic = Topic.objects.create(
+            title="Pauta",
+            description="desc",
+            created_by=self.admin,
+            status="OPEN",
+            session_started_at=timezone.now() - timezone.timedelta(minutes=5),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        self.batch_url = "/votes/batch"
+
+    def record(self, voter, vote="YES", **extra):
+        return dict(topic_id=self.topic.id, user_id=voter.id, vote=vote, **extra)
+
+    def test_batch_requires_staff(self):
+        self.client.force_authenticate(user=self.voters[0])
+        response = self.client.post(
+            self.batch_url, {"votes": [self.record(self.voters[0])]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_batch_reports_each_record(self):
+        Vote.objects.create(topic=self.topic, user=self.voters[1], vote="NO")
+        records = [
+            self.record(self.voters[0]),
+            self.record(self.voters[1]),
+            self.record(self.voters[0], vote="NO"),
+            dict(self.record(self.voters[2]), topic_id=999999),
+            dict(self.record(self.voters[2]), user_id=999999),
+            self.record(self.voters[3], vote="MAYBE"),
+            self.record(
+                self.voters[4],
+                cast_at=(timezone.now() - timezone.timedelta(hours=2)).isoformat(),
+            ),
+            self.record(self.voters[5], vote="NO"),
+        ]
+        response = self.client.post(self.batch_url, {"votes": records}, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data["total_votes"], 2)
-        self.assertEqual(response.data["yes_votes"], 1)
-        self.assertEqual(response.data["no_votes"], 1)
+        self.assertEqual(
+            [entry["status"] for entry in response.data["results"]],
+            [
+                "accepted",
+                "rejected",
+                "rejected",
+                "rejected",
+                "rejected",
+                "rejected",
+                "rejected",
+                "accepted",
+            ],
+        )
+        self.assertEqual(response.data["accepted"], 2)
+        self.assertEqual(response.data["rejected"], 6)
+        self.assertIn("vote", response.data["results"][5]["error"])
+
+        self.assertEqual(
+            get_tally(self.topic.id), {"total": 2, "yes_votes": 1, "no_votes": 1}
+        )
+        self.assertEqual(Vote.objects.filter(topic=self.topic).count(), 3)
+
+    def test_batch_keeps_cast_time(self):
+        cast_at = timezone.now() - timezone.timedelta(minutes=3)
+        records = [self.record(self.voters[0], cast_at=cast_at.isoformat())]
+        self.client.post(self.batch_url, {"votes": records}, format="json")
+        self.assertEqual(Vote.objects.get(user=self.voters[0]).created_at, cast_at)
+
+    def test_batch_query_count_independent_of_size(self):
+        # Existing counters on every shard, so neither batch creates one
+        TallyShard.objects.bulk_create(
+            TallyShard(topic=self.topic, choice="YES", shard=shard)
+            for shard in range(self.topic.tally_shards)
+        )
+
+        def post(voters):
+            records = [self.record(voter) for voter in voters]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    self.batch_url, {"votes": records}, format="json"
+                )
+            self.assertEqual(response.data["accepted"], len(voters))
+            return len(queries)
+
+        self.assertEqual(post(self.voters[:2]), post(self.voters[2:]))
+
+    def test_batch_rechecks_snapshot_before_insert(self):
+        self.topic.status = "CLOSED"
+        self.topic.save()
+        in_window = batch.in_session_window
+
+        def snapshot_meanwhile(topic, cast_at):
+            # The scheduler snapshots the topic while the batch is validated
+            snapshot_result(topic)
+            return in_window(topic, cast_at)
+
+        with mock.patch("votes.batch.in_session_window", snapshot_meanwhile):
+            response = self.client.post(
+                self.batch_url, {"votes": [self.record(self.voters[0])]}, format="json"
+            )
+        self.assertEqual(response.data["accepted"], 0)
+        self.assertEqual(
+            response.data["results"][0]["error"], "Resultado da pauta já foi apurado"
+        )
+        self.assertFalse(Vote.objects.filter(topic=self.topic).exists())
+
+    def test_empty_batch_rejected(self):
+        response = self.client.post(self.batch_url, {"votes": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.data)
+
+
+@override_settings(LIVE_RESULTS_POLL_INTERVAL=0.01, LIVE_RESULTS_KEEPALIVE=5)
+class LivePollerRecoveryTest(TransactionTestCase):
+    # Not a TestCase: the connection is really closed, which its wrapping
+    # transaction would not survive
+    def setUp(self):
+        user = User.objects.create_user(
+            cpf="12345678901", name="Test User", email="test@example.com"
+        )
+        self.topic = Topic.objects.create(
+            title="Pauta",
+            description="desc",
+            created_by=user,
+            status="OPEN",
+            session_started_at=timezone.now(),
+        )
+
+    @override_settings(LIVE_RESULTS_POLL_INTERVAL=0.01)
+    async def test_poller_reconnects_after_connection_loss(self):
+        hub = get_hub(self.topic.id)
+        queue = hub.subscribe()
+        while hub.state is None:
+            await asyncio.sleep(0.01)
+
+        # The server went away under the poller's connection
+        await sync_to_async(lambda: connection.connection.close())()
+        with self.assertLogs("votes.live", level="ERROR"):
+            await asyncio.sleep(0.1)
+        self.assertFalse(hub.poller.done())
+
+        # Polling resumes on a new connection
+        await sync_to_async(increment_tally)(self.topic.id, "YES")
+        event, data = await asyncio.wait_for(queue.get(), timeout=5)
+        self.assertEqual((event, data["total_votes"]), ("tally", 1))
+        hub.unsubscribe(queue)
+
+
+class LiveResultsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.topic = Topic.objects.create(
+            title="Pauta",
+            description="desc",
+            created_by=self.user,
+            status="OPEN",
+            session_started_at=timezone.now(),
+        )
+
+    async def test_stream_pushes_tally_and_close(self):
+        stream = stream_topic(self.topic.id)
+        snapshot = await stream.__anext__()
+        self.assertIn("event: snapshot", snapshot)
+        self.assertIn('"total_votes": 0', snapshot)
+
+        # Let the hub's poller record its baseline before changing the row
+        while get_hub(self.topic.id).state is None:
+            await asyncio.sleep(0.01)
+
+        await sync_to_async(increment_tally)(self.topic.id, "YES")
+        tally = await stream.__anext__()
+        self.assertIn("event: tally", tally)
+        self.assertIn('"delta": {"YES": 1, "NO": 0}', tally)
+
+        await Topic.objects.filter(pk=self.topic.pk).aupdate(status="CLOSED")
+        closed = await stream.__anext__()
+        self.assertIn("event: status", closed)
+        self.assertIn('"topic_status": "CLOSED"', closed)
+
+        with self.assertRaises(StopAsyncIteration):
+            await stream.__anext__()
+        self.assertNotIn(self.topic.id, live_hubs)
+
+    async def test_watchers_share_one_hub(self):
+        first = stream_topic(self.topic.id)
+        second = stream_topic(self.topic.id)
+        await first.__anext__()
+        await second.__anext__()
+        hub = get_hub(self.topic.id)
+        self.assertEqual(len(hub.subscribers), 2)
+        await first.aclose()
+        await second.aclose()
+        self.assertNotIn(self.topic.id, live_hubs)
+
+    async def test_live_view_streams_over_asgi(self):
+        response = await self.async_client.get(f"/topics/{self.topic.id}/live")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        content = response.streaming_content
+        self.assertIn(b"event: snapshot", await content.__anext__())
+        await content.aclose()
+
+    def test_live_view_sends_snapshot_over_wsgi(self):
+        response = APIClient().get(f"/topics/{self.topic.id}/live")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b"event: snapshot", response.content)
+        self.assertIn(b"retry: ", response.content)
+
+    def test_live_view_unknown_topic(self):
+        response = APIClient().get("/topics/999999/live")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@skipIf(
+    connection.vendor == "sqlite",
+    "SQLite rejects concurrent writers with 'database is locked'",
+)
+class ConcurrentVoteTest(TransactionTestCase):
+    parallel_submits = 8
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.topic = Topic.objects.create(
+            title="Pauta",
+            description="desc",
+            created_by=self.user,
+            status="OPEN",
+            session_started_at=timezone.now(),
+        )
+        self.vote_url = f"/topics/{self.topic.id}/vote"
+
+    def submit(self, barrier, choice):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        try:
+            barrier.wait()
+            return client.post(self.vote_url, {"vote": choice}).status_code
+        finally:
+            connection.close()
+
+    def test_parallel_double_submit_lands_one_vote(self):
+        barrier = Barrier(self.parallel_submits)
+        choices = ["YES", "NO"] * (self.parallel_submits // 2)
+        with ThreadPoolExecutor(max_workers=self.parallel_submits) as pool:
+            codes = list(pool.map(lambda c: self.submit(barrier, c), choices))
+
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(
+            codes.count(status.HTTP_400_BAD_REQUEST), self.parallel_submits - 1
+        )
+        self.assertEqual(Vote.objects.filter(topic=self.topic).count(), 1)
+        self.assertEqual(get_tally(self.topic.id)["total"], 1)
+
+
+class BenchmarkCommandTest(TransactionTestCase):
+    def test_benchmark_writes_report_and_cleans_up(self):
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            call_command(
+                "benchmark",
+                "--users=2",
+                "--topics=1",
+                "--concurrency=1",
+                "--reads=3",
+                f"--output={output.name}",
+                stdout=StringIO(),
+            )
+            report = json.load(output)
+
+        self.assertEqual(
+            set(report["endpoints"]), {"register", "login", "vote", "list", "result"}
+        )
+        self.assertEqual(report["endpoints"]["vote"]["requests"], 2)
+        self.assertEqual(report["endpoints"]["vote"]["errors"], 0)
+        self.assertIn("p99_ms", report["endpoints"]["list"])
+        self.assertIn("queries_per_request", report["endpoints"]["result"])
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Topic.objects.exists())
+
+
+class BenchmarkHTTPTest(LiveServerTestCase):
+    def test_benchmark_against_running_server(self):
+        out = StringIO()
+        call_command(
+            "benchmark",
+            f"--url={self.live_server_url}",
+            "--users=2",
+            "--topics=1",
+            "--concurrency=1",
+            "--reads=3",
+            stdout=out,
+        )
+        self.assertIn("vote: 2 requests, 0 errors", out.getvalue())
+        self.assertIn("result: 3 requests, 0 errors", out.getvalue())
+        self.assertFalse(User.objects.exists())
+
+
+class VoteExportTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            cpf="12345678901",
+            name="Staff",
+            email="staff@example.com",
+            password="testpass123",
+            is_staff=True,
+        )
+        self.voter = User.objects.create_user(
+            cpf="98765432100",
+            name="Eleitor, Júnior",
+            email="voter@example.com",
+            password="otherpass123",
+        )
+        self.topic = Topic.objects.create(
+            title="Pauta", description="desc", created_by=self.staff
+        )
+        self.vote = Vote.objects.create(topic=self.topic, user=self.voter, vote="YES")
+        Vote.objects.create(topic=self.topic, user=self.staff, vote="NO")
+        self.client = APIClient()
+
+    def test_csv_export_streams_all_votes(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(f"/topics/{self.topic.id}/votes.csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment", response["Content-Disposition"])
+
+        rows = list(
+            csv.reader(b"".join(response.streaming_content).decode().splitlines())
+        )
+        self.assertEqual(rows[0], list(HEADER))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(
+            rows[1][:5],
+            [
+                str(self.vote.id),
+                str(self.voter.id),
+                "98765432100",
+                "Eleitor, Júnior",
+                "YES",
+            ],
+        )
+
+    def test_csv_neutralizes_formulas(self):
+        User.objects.filter(pk=self.voter.pk).update(name='=HYPERLINK("x")')
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(f"/topics/{self.topic.id}/votes.csv")
+        rows = list(
+            csv.reader(b"".join(response.streaming_content).decode().splitlines())
+        )
+        self.assertEqual(rows[1][3], '\'=HYPERLINK("x")')
+
+        # NDJSON is not opened as a spreadsheet: names are kept as typed
+        response = self.client.get(f"/topics/{self.topic.id}/votes.ndjson")
+        line = b"".join(response.streaming_content).decode().splitlines()[0]
+        self.assertEqual(json.loads(line)["name"], '=HYPERLINK("x")')
+
+    def test_ndjson_export(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(f"/topics/{self.topic.id}/votes.ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["vote"] for line in lines], ["YES", "NO"])
+        self.assertEqual(
+            json.loads(lines[0])["created_at"], self.vote.created_at.isoformat()
+        )
+
+    async def test_export_streams_asynchronously_over_asgi(self):
+        token = await sync_to_async(UserRefreshToken.for_user)(self.staff)
+        response = await AsyncClient().get(
+            f"/topics/{self.topic.id}/votes.ndjson",
+            headers={"Authorization": f"Bearer {token.access_token}"},
+        )
+        self.assertTrue(response.is_async)
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual(len(lines), 2)
+
+    def test_export_requires_staff(self):
+        self.client.force_authenticate(user=self.voter)
+        response = self.client.get(f"/topics/{self.topic.id}/votes.csv")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unknown_format_or_topic(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(f"/topics/{self.topic.id}/votes.xml")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get("/topics/999999/votes.csv")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".ndjson") as output:
+            out = StringIO()
+            call_command(
+                "export_votes",
+                self.topic.id,
+                "--format",
+                "ndjson",
+                "--output",
+                output.name,
+                "--chunk-size",
+                1,
+                stdout=out,
+            )
+            with open(output.name, encoding="utf-8") as exported:
+                records = [json.loads(line) for line in exported]
+        self.assertEqual(
+            [record["cpf"] for record in records], ["98765432100", "12345678901"]
+        )
+        self.assertIn("2 line(s) written", out.getvalue())
+
+
+class MyVotesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.topics = [
+            Topic.objects.create(
+                title=f"Pauta {i}", description="desc", created_by=self.user
+            )
+            for i in range(5)
+        ]
+        for topic in self.topics[:4]:
+            Vote.objects.create(topic=topic, user=self.user, vote="YES")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_history_pages_newest_first(self):
+        seen = []
+        url = "/me/votes?page_size=3"
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item["topic_id"] for item in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, [t.id for t in reversed(self.topics[:4])])
+        self.assertEqual(response.data["results"][-1]["topic_title"], "Pauta 0")
+
+    def test_history_requires_authentication(self):
+        response = APIClient().get("/me/votes")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def listing(self, **extra):
+        token = UserRefreshToken.for_user(self.user).access_token
+        return APIClient().get(
+            "/topics?include=my_vote", HTTP_AUTHORIZATION=f"Bearer {token}", **extra
+        )
+
+    def test_listing_flags_own_votes_in_one_query(self):
+        # The page and the page's votes
+        with self.assertNumQueries(2):
+            response = self.listing()
+        results = {item["id"]: item for item in response.json()["results"]}
+        self.assertEqual(results[self.topics[0].id]["my_vote"], "YES")
+        self.assertTrue(results[self.topics[0].id]["has_voted"])
+        self.assertFalse(results[self.topics[4].id]["has_voted"])
+        self.assertIsNone(results[self.topics[4].id]["my_vote"])
+        self.assertIn("private", response["Cache-Control"])
+
+        # Voting changes the validator of the personal listing
+        etag = response["ETag"]
+        self.assertEqual(
+            self.listing(HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+        Vote.objects.create(topic=self.topics[4], user=self.user, vote="NO")
+        self.assertEqual(
+            self.listing(HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK
+        )
+
+    @override_settings(VOTE_BUFFER_ENABLED=True)
+    def test_listing_includes_buffered_votes(self):
+        PendingVote.objects.create(topic=self.topics[4], user=self.user, vote="NO")
+        results = {item["id"]: item for item in self.listing().json()["results"]}
+        self.assertEqual(results[self.topics[4].id]["my_vote"], "NO")
+
+    def test_flags_are_opt_in_and_need_a_user(self):
+        response = APIClient().get("/topics")
+        self.assertNotIn("has_voted", response.json()["results"][0])
+        response = APIClient().get("/topics?include=my_vote")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ShardedTallyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.topic = Topic.objects.create(
+            title="Pauta", description="desc", created_by=self.user, tally_shards=4
+        )
+
+    def test_increments_spread_over_shards(self):
+        for _ in range(60):
+            increment_tally(self.topic.id, "YES")
+        for _ in range(40):
+            increment_tally(self.topic.id, "NO", shards=4)
+
+        shards = TallyShard.objects.filter(topic=self.topic)
+        self.assertGreater(shards.filter(choice="YES").count(), 1)
+        self.assertLessEqual(shards.filter(choice="YES").count(), 4)
+        self.assertEqual(
+            set(shards.values_list("shard", flat=True)) - {0, 1, 2, 3}, set()
+        )
+        self.assertEqual(
+            get_tally(self.topic.id), {"total": 100, "yes_votes": 60, "no_votes": 40}
+        )
+
+    @override_settings(TALLY_SHARDS=3)
+    def test_default_shard_count_from_settings(self):
+        topic = Topic.objects.create(
+            title="Outra", description="desc", created_by=self.user
+        )
+        self.assertEqual(topic.tally_shards, 3)
+
+
+class RebuildTalliesCommandTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.other_user = User.objects.create_user(
+            cpf="98765432100",
+            name="Other User",
+            email="other@example.com",
+            password="otherpass123",
+        )
+        self.topic = Topic.objects.create(
+            title="Pauta",
+            description="desc",
+            created_by=self.user,
+            status="OPEN",
+            session_started_at=timezone.now(),
+        )
+        # Votes inserted behind the counters' back
+        Vote.objects.create(topic=self.topic, user=self.user, vote="YES")
+        Vote.objects.create(topic=self.topic, user=self.other_user, vote="NO")
+
+    def test_rebuild_fixes_drifted_counters(self):
+        out = StringIO()
+        call_command("rebuild_tallies", stdout=out)
+        self.assertEqual(
+            get_tally(self.topic.id), {"total": 2, "yes_votes": 1, "no_votes": 1}
+        )
+        self.assertIn("1 topic(s) reconciled", out.getvalue())
+
+    def test_rebuild_removes_surplus_and_keeps_other_shards(self):
+        TallyShard.objects.create(topic=self.topic, choice="YES", shard=3, count=4)
+        TallyShard.objects.create(topic=self.topic, choice="NO", shard=5, count=1)
+        call_command("rebuild_tallies", stdout=StringIO())
+        self.assertEqual(
+            get_tally(self.topic.id), {"total": 2, "yes_votes": 1, "no_votes": 1}
+        )
+        self.assertEqual(TallyShard.objects.get(topic=self.topic, choice="NO").shard, 5)
+
+    def test_check_only_reports(self):
+        out = StringIO()
+        call_command("rebuild_tallies", "--check", stdout=out)
+        self.assertEqual(get_tally(self.topic.id)["total"], 0)
+        self.assertIn("1 topic(s) out of sync", out.getvalue())
+
+
+class QueryPlanCommandTest(TestCase):
+    def test_hot_queries_use_their_indexes(self):
+        out = StringIO()
+        call_command("check_query_plans", stdout=out)
+        self.assertIn("topic listing: topic_newest_idx", out.getvalue())
+        self.assertIn(
+            "topic tally: votes_tallyshard_topic_id_choice_shard", out.getvalue()
+        )
+        self.assertIn("snapshot vote count: vote_topic_choice_idx", out.getvalue())
+        self.assertIn("All hot queries use their indexes", out.getvalue())
@@ -2,6 +2,15 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    path("votes/batch", views.vote_batch_view, name="vote-batch"),
+    path("me/votes", views.my_votes_view, name="my-votes"),
     path("topics/<int:topic_id>/vote", views.vote_view, name="vote"),
+    path("topics/<int:topic_id>/my-vote", views.my_vote_view, name="my-vote"),
     path("topics/<int:topic_id>/result", views.topic_result_view, name="topic-result"),
+    path("topics/<int:topic_id>/live", views.topic_live_view, name="topic-live"),
+    path(
+        "topics/<int:topic_id>/votes.<str:export_format>",
+        views.vote_export_view,
+        name="vote-export",
+    ),
 ]
@@ -1,79 +1,285 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Q
+from django.db import IntegrityError, transaction
+from topics.cache import cache_timeout, get_or_build, invalidate_result, result_key
 from topics.models import Topic
+from topics.pagination import KeysetPagination
+from voting_system.idempotency import idempotent
+from voting_system.instrumentation import span
+from voting_system.responses import (
+    REVALIDATE,
+    SHARED_REVALIDATE,
+    conditional_json,
+    is_not_modified,
+    make_etag,
+    method_not_allowed,
+    not_found,
+)
+from voting_system.throttling import VoteUserThrottle
+from .batch import ingest_votes
+from .buffer import enqueue_vote, find_user_vote
+from .export import CONTENT_TYPES, astream_votes, stream_votes
+from .live import format_event, read_state, stream_topic
 from .models import Vote
-from .serializers import VoteCreateSerializer, TopicResultSerializer
+from .serializers import (
+    TopicResultSerializer,
+    UserVoteSerializer,
+    VoteBatchSerializer,
+    VoteCreateSerializer,
+)
+from .tallies import aget_tally, increment_tally
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([VoteUserThrottle])
+@idempotent
 def vote_view(request, topic_id):
-    topic = get_object_or_404(Topic, id=topic_id)
+    serializer = VoteCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    # Check if session is active
-    topic.close_session_if_expired()
-    if not topic.is_session_active:
-        return Response(
-            {"error": "Sessão de votação não está ativa"},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+    try:
+        with transaction.atomic():
+            topic = get_object_or_404(
+                Topic.objects.only(
+                    "status", "session_started_at", "session_duration", "tally_shards"
+                ),
+                id=topic_id,
+            )
 
-    # Check if user already voted
-    if Vote.objects.filter(topic=topic, user=request.user).exists():
+            # Check if session is active (status may lag until the scheduler's tick)
+            if not topic.is_session_active:
+                return Response(
+                    {"error": "Sessão de votação não está ativa"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            # The (topic, user) unique constraint is the duplicate check, so
+            # concurrent double-submits cannot both get through
+            if settings.VOTE_BUFFER_ENABLED:
+                vote = enqueue_vote(
+                    topic, request.user, serializer.validated_data["vote"]
+                )
+            else:
+                vote = Vote.objects.create(
+                    topic=topic,
+                    user=request.user,
+                    vote=serializer.validated_data["vote"],
+                )
+                increment_tally(topic.id, vote.vote, shards=topic.tally_shards)
+    except IntegrityError:
         return Response(
             {"error": "Você já votou nesta pauta"}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    serializer = VoteCreateSerializer(data=request.data)
-    if serializer.is_valid():
-        vote = Vote.objects.create(
-            topic=topic, user=request.user, vote=serializer.validated_data["vote"]
-        )
-
+    if settings.VOTE_BUFFER_ENABLED:
+        # Acknowledged now, counted in the results once flushed
         return Response(
             {
                 "message": "Voto registrado com sucesso!",
                 "vote": {
-                    "id": vote.id,
                     "vote": vote.vote,
                     "created_at": vote.created_at,
+                    "pending": True,
                 },
             },
-            status=status.HTTP_201_CREATED,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    invalidate_result(topic.id)
+    return Response(
+        {
+            "message": "Voto registrado com sucesso!",
+            "vote": {
+                "id": vote.id,
+                "vote": vote.vote,
+                "created_at": vote.created_at,
+            },
+        },
+        status=status.HTTP_201_CREATED,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def my_vote_view(request, topic_id):
+    # Sees buffered votes too, so voters always read their own vote back
+    found = find_user_vote(topic_id, request.user)
+    if found is None:
+        return Response(
+            {"error": "Você ainda não votou nesta pauta"},
+            status=status.HTTP_404_NOT_FOUND,
         )
 
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    choice, pending = found
+    return Response({"topic_id": topic_id, "vote": choice, "pending": pending})
 
 
 @api_view(["GET"])
-@permission_classes([AllowAny])
-def topic_result_view(request, topic_id):
-    topic = get_object_or_404(Topic, id=topic_id)
-
-    # Get vote counts
-    vote_counts = Vote.objects.filter(topic=topic).aggregate(
-        total=Count("id"),
-        yes_votes=Count("id", filter=Q(vote="YES")),
-        no_votes=Count("id", filter=Q(vote="NO")),
+@permission_classes([IsAuthenticated])
+def my_votes_view(request):
+    # Newest first, one range scan of vote_user_history_idx per page
+    paginator = KeysetPagination()
+    votes = Vote.objects.filter(user=request.user).values(
+        "id", "topic_id", "topic__title", "vote", "created_at"
     )
+    page = paginator.paginate_queryset(votes, request)
+    return paginator.get_paginated_response(UserVoteSerializer(page, many=True).data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def vote_export_view(request, topic_id, export_format):
+    # Full vote list for auditors, streamed instead of built in memory
+    if export_format not in CONTENT_TYPES:
+        raise Http404
+    get_object_or_404(Topic.objects.only("id"), id=topic_id)
+
+    if isinstance(request._request, ASGIRequest):
+        lines = astream_votes(topic_id, export_format)
+    else:
+        lines = stream_votes(topic_id, export_format)
+    return StreamingHttpResponse(
+        lines,
+        content_type=CONTENT_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="pauta-{topic_id}-votos.{export_format}"'
+            )
+        },
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def vote_batch_view(request):
+    # Bulk ingestion for kiosks and aggregators, restricted to staff clients
+    serializer = VoteBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(
+            {"error": "Lote inválido", "details": serializer.errors},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    report = ingest_votes(serializer.validated_data["votes"])
+    accepted = sum(1 for entry in report if entry["status"] == "accepted")
+    return Response(
+        {
+            "accepted": accepted,
+            "rejected": len(report) - accepted,
+            "results": report,
+        }
+    )
+
+
+async def topic_result_view(request, topic_id):
+    if request.method not in ("GET", "HEAD"):
+        return method_not_allowed(["GET"])
+
+    entry = await get_or_build(
+        result_key(topic_id), "result", lambda: build_result(request, topic_id)
+    )
+    if entry is None:
+        return not_found()
+    return conditional_json(
+        request, entry["data"], entry["etag"], entry["cache_control"]
+    )
+
+
+async def build_result(request, topic_id):
+    try:
+        topic = await Topic.objects.select_related("result_snapshot").aget(id=topic_id)
+    except Topic.DoesNotExist:
+        return None, 0
+
+    # Written by the scheduler once the session closes (and buffered votes
+    # have landed); until then the live counters are served
+    snapshot = getattr(topic, "result_snapshot", None)
+    final = snapshot is not None
+    if final:
+        # Read from the snapshot, whatever the vote volume
+        vote_counts = {
+            "total": snapshot.total_votes,
+            "yes_votes": snapshot.yes_votes,
+            "no_votes": snapshot.no_votes,
+        }
+    else:
+        # Sums the topic's counter shards, no scan of the votes
+        vote_counts = await aget_tally(topic.id)
+
+    # The title and description can still be edited in the admin
+    etag = make_etag(
+        "result",
+        topic.id,
+        topic.updated_at,
+        topic.status,
+        topic.is_session_active,
+        vote_counts["yes_votes"],
+        vote_counts["no_votes"],
+        final,
+    )
+    entry = {
+        "etag": etag,
+        "cache_control": SHARED_REVALIDATE if final else REVALIDATE,
+        "data": None,
+    }
+    if is_not_modified(request, etag):
+        # Nothing to send: skip serializing, and leave the cache alone
+        return entry, 0
 
     result_data = {
         "topic_id": topic.id,
         "topic_title": topic.title,
         "topic_description": topic.description,
         "topic_status": topic.status,
-        "total_votes": vote_counts["total"] or 0,
-        "yes_votes": vote_counts["yes_votes"] or 0,
-        "no_votes": vote_counts["no_votes"] or 0,
+        "total_votes": vote_counts["total"],
+        "yes_votes": vote_counts["yes_votes"],
+        "no_votes": vote_counts["no_votes"],
         "results": {
-            "YES": vote_counts["yes_votes"] or 0,
-            "NO": vote_counts["no_votes"] or 0,
+            "YES": vote_counts["yes_votes"],
+            "NO": vote_counts["no_votes"],
         },
+        "turnout": snapshot.turnout if final else None,
+        "closed_at": snapshot.closed_at if final else None,
     }
 
-    serializer = TopicResultSerializer(result_data)
-    return Response(serializer.data)
+    with span("serialize"):
+        entry["data"] = TopicResultSerializer(result_data).data
+    # Until the snapshot exists (buffered votes still landing, or a replica
+    # lagging behind it) a CLOSED result is not final yet
+    return entry, cache_timeout(topic, final)
+
+
+async def topic_live_view(request, topic_id):
+    """
+    Server-Sent Events feed of a topic's tally and status changes.
+    Streaming needs the ASGI entry point; under WSGI a single snapshot is
+    sent and EventSource's reconnect delay turns it into polling.
+    """
+    if request.method != "GET":
+        return HttpResponse(status=405, headers={"Allow": "GET"})
+
+    if not isinstance(request, ASGIRequest):
+        state = await read_state(topic_id)
+        if state is None:
+            raise Http404
+        return HttpResponse(
+            format_event("snapshot", state, retry=settings.LIVE_RESULTS_RETRY_MS),
+            content_type="text/event-stream",
+        )
+
+    if not await Topic.objects.filter(pk=topic_id).aexists():
+        raise Http404
+
+    return StreamingHttpResponse(
+        stream_topic(topic_id),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,89 @@
+import hashlib
+import json
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+def get_cache():
+    return caches[settings.IDEMPOTENCY_CACHE_ALIAS]
+
+
+def fingerprint(data):
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def should_store(response):
+    # Outcomes of the view itself; 5xx and rate limits are worth retrying
+    return (
+        200 <= response.status_code < 500
+        and response.status_code != status.HTTP_429_TOO_MANY_REQUESTS
+    )
+
+
+def idempotent(view):
+    """
+    Makes a DRF POST view honor the Idempotency-Key header: the first
+    response for a user's key is kept for IDEMPOTENCY_KEY_TTL seconds and
+    replayed for retries with the same key, without running the view.
+
+    Goes under @api_view, so authentication and throttling still run.
+    Requests without the header, or without a user, are not affected.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"error": f"{HEADER} deve ter até {MAX_KEY_LENGTH} caracteres"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        cache_key = f"idempotency:{request.user.pk}:{request.path}:{digest}"
+        body = fingerprint(request.data)
+        cache = get_cache()
+
+        stored = cache.get(cache_key)
+        if stored is not None:
+            if stored["body"] != body:
+                return Response(
+                    {"error": f"{HEADER} já usada com outro conteúdo"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            return Response(
+                stored["data"],
+                status=stored["status"],
+                headers={"Idempotent-Replayed": "true"},
+            )
+
+        # Only one request per key runs the view at a time
+        lock_key = f"{cache_key}:lock"
+        if not cache.add(lock_key, 1, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            return Response(
+                {"error": "Requisição com esta chave ainda em andamento"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        try:
+            response = view(request, *args, **kwargs)
+            if should_store(response):
+                stored = {
+                    "body": body,
+                    "status": response.status_code,
+                    "data": response.data,
+                }
+                cache.set(cache_key, stored, settings.IDEMPOTENCY_KEY_TTL)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
@@ -0,0 +1,72 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Active collector for the current request/task. Context variables follow
+# the work into sync_to_async threads, so queries run by async views are
+# attributed to the right request.
+_collector = ContextVar("query_collector", default=None)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # Named code sections timed with span(), in seconds
+        self.spans = {}
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _collector.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - start
+
+
+def install(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install)
+
+
+@contextmanager
+def collect_queries():
+    """Counts and times the SQL statements run inside the block."""
+    # Connections opened before this module was imported get it here
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+
+    stats = QueryStats()
+    token = _collector.set(stats)
+    try:
+        yield stats
+    finally:
+        _collector.reset(token)
+
+
+@contextmanager
+def span(name):
+    """
+    Times a named section of the current request, e.g. serialization.
+    A no-op when nothing is collecting.
+    """
+    stats = _collector.get()
+    if stats is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.spans[name] = stats.spans.get(name, 0.0) + time.perf_counter() - start
@@ -0,0 +1,22 @@
+import threading
+from collections import Counter
+
+# Process-local counters. Each worker reports its own numbers, which keeps
+# incrementing free of any network round-trip on hot paths.
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot():
+    with _lock:
+        return dict(_counters)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
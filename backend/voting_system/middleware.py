@@ -0,0 +1,220 @@
+import json
+import logging
+import random
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from . import metrics
+from .instrumentation import collect_queries
+from .responses import json_response
+from .routers import replica_reads
+
+logger = logging.getLogger("voting_system.timing")
+
+
+class ServerTimingMiddleware:
+    """
+    Reports per-request query count, DB time, view time and render time in
+    a Server-Timing header and a structured log line.
+
+    Enabled with SERVER_TIMING_ENABLED and applied to a random
+    SERVER_TIMING_SAMPLE_RATE fraction of requests.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        with collect_queries() as queries:
+            start = request._timing_start = time.perf_counter()
+            response = self.get_response(request)
+        return self.report(request, response, queries, start)
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        with collect_queries() as queries:
+            start = request._timing_start = time.perf_counter()
+            response = await self.get_response(request)
+        return self.report(request, response, queries, start)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, "_timing_start"):
+            request._timing_view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called between the view returning and the response being rendered
+        if hasattr(request, "_timing_start"):
+            request._timing_view_end = time.perf_counter()
+        return response
+
+    def report(self, request, response, queries, start):
+        end = time.perf_counter()
+        view_start = getattr(request, "_timing_view_start", start)
+        view_end = getattr(request, "_timing_view_end", end)
+
+        timings = {
+            "db": queries.duration,
+            "view": view_end - view_start,
+            "render": end - view_end,
+            **queries.spans,
+            "total": end - start,
+        }
+        response["Server-Timing"] = ", ".join(
+            self.format_metric(name, seconds, queries.count)
+            for name, seconds in timings.items()
+        )
+
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "queries": queries.count,
+                    **{
+                        f"{name}_ms": round(seconds * 1000, 3)
+                        for name, seconds in timings.items()
+                    },
+                }
+            )
+        )
+        return response
+
+    def format_metric(self, name, seconds, query_count):
+        metric = f"{name};dur={seconds * 1000:.3f}"
+        if name == "db":
+            metric += f';desc="{query_count} queries"'
+        return metric
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe requests read from the replicas, unless the client wrote
+    recently: every other request, and every request within
+    REPLICA_STICKY_SECONDS of one, reads from the primary.
+
+    Recent writers are recognized by a cookie here and, for API clients
+    that do not send cookies, by their user id at authentication.
+    """
+
+    sync_capable = True
+    async_capable = True
+    cookie_name = "db_primary"
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(self.can_use_replicas(request)):
+            response = self.get_response(request)
+        return self.stick(request, response)
+
+    async def __acall__(self, request):
+        with replica_reads(self.can_use_replicas(request)):
+            response = await self.get_response(request)
+        return self.stick(request, response)
+
+    def can_use_replicas(self, request):
+        return (
+            request.method in self.safe_methods
+            and self.cookie_name not in request.COOKIES
+        )
+
+    def stick(self, request, response):
+        if request.method in self.safe_methods:
+            return response
+
+        response.set_cookie(
+            self.cookie_name,
+            "1",
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+        return response
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Admission control: at most ADMISSION_MAX_CONCURRENCY requests run at
+    once in this worker process. The rest are refused right away with 429
+    and Retry-After, before they reach the ORM, instead of queueing for
+    database connections.
+
+    Only the view's run counts: streamed bodies (e.g. the live results)
+    are sent after the slot is released.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.ADMISSION_MAX_CONCURRENCY:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.limit = settings.ADMISSION_MAX_CONCURRENCY
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enter():
+            return self.reject()
+        try:
+            return self.get_response(request)
+        finally:
+            self.leave()
+
+    async def __acall__(self, request):
+        if not self.enter():
+            return self.reject()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.leave()
+
+    def enter(self):
+        with self.lock:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def reject(self):
+        metrics.incr("admission.rejected")
+        return json_response(
+            {"detail": "Servidor sobrecarregado. Tente novamente em instantes."},
+            status=429,
+            headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+        )
@@ -0,0 +1,61 @@
+import hashlib
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+
+# Clients may keep a copy but must revalidate it (with its ETag) every time
+REVALIDATE = "no-cache"
+# Same, for payloads built for one user: shared caches must not keep them
+PRIVATE_REVALIDATE = "private, no-cache"
+# For payloads that are the same for everyone: shared caches may keep
+# them, revalidating with the ETag
+SHARED_REVALIDATE = "public, no-cache"
+
+
+def json_response(data, status=200, headers=None):
+    """JSON response rendered like DRF's, for the plain async views."""
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type="application/json",
+        status=status,
+        headers=headers,
+    )
+
+
+def not_found(detail=NotFound.default_detail):
+    return json_response({"detail": detail}, status=404)
+
+
+def method_not_allowed(allowed):
+    return json_response(
+        {"detail": "Método não permitido."},
+        status=405,
+        headers={"Allow": ", ".join(allowed)},
+    )
+
+
+def make_etag(*parts):
+    """Strong validator derived from the values a payload is built from."""
+    digest = hashlib.md5(
+        ":".join(str(part) for part in parts).encode(), usedforsecurity=False
+    )
+    return quote_etag(digest.hexdigest())
+
+
+def is_not_modified(request, etag):
+    """True when the request's If-None-Match already names ``etag``."""
+    return get_conditional_response(request, etag=etag) is not None
+
+
+def conditional_json(request, data, etag, cache_control=REVALIDATE):
+    """
+    A 304 when the client's copy is current, the JSON payload otherwise.
+    ``data`` is None when the caller already found the copy current and
+    skipped building the payload.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if data is None or is_not_modified(request, etag):
+        return HttpResponseNotModified(headers=headers)
+    return json_response(data, headers=headers)
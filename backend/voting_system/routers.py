@@ -0,0 +1,63 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+
+# The replica the current request/task reads from, picked once so all its
+# reads see the same replication lag. None (the default) reads from the
+# primary, so management commands, workers and tests use it.
+_read_replica = ContextVar("read_replica", default=None)
+
+
+def sticky_key(user_id):
+    return f"db:primary:{user_id}"
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    replica = None
+    if enabled and settings.DATABASE_REPLICAS:
+        replica = random.choice(settings.DATABASE_REPLICAS)
+    token = _read_replica.set(replica)
+    try:
+        yield
+    finally:
+        _read_replica.reset(token)
+
+
+def pin_primary():
+    """Sends the rest of the current request's reads to the primary."""
+    _read_replica.set(None)
+
+
+def stick_user(user_id):
+    """Keeps the user's next requests on the primary for a while."""
+    if settings.DATABASE_REPLICAS:
+        cache.set(sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def pin_if_sticky(user_id):
+    if _read_replica.get() and cache.get(sticky_key(user_id)):
+        pin_primary()
+
+
+class ReplicaRouter:
+    """
+    Routes reads to the replica picked for the request when it allows
+    replica reads (see ReplicaRoutingMiddleware), everything else to the
+    primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_replica.get() or "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
-from decouple import config
+from corsheaders.defaults import default_headers
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -32,7 +34,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "voting_system.middleware.ServerTimingMiddleware",
+    "voting_system.middleware.ReplicaRoutingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
+    # Below CORS, so the frontend can read its 429s and their Retry-After
+    "voting_system.middleware.ConcurrencyLimitMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -71,9 +77,145 @@ DATABASES = {
         "PASSWORD": config("DB_PASSWORD", default="postgres"),
         "HOST": config("DB_HOST", default="db"),
         "PORT": config("DB_PORT", default="5432"),
+        # Reuse connections across requests; checked before reuse so a
+        # restarted database does not fail the next request. Use 0 under
+        # ASGI, where each request runs its sync code in a new thread.
+        "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=60, cast=int),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Read replicas of the default database, as "host" or "host:port" entries
+# separated by commas. Safe requests read from them (see
+# voting_system.routers); writes and requests right after a write use the
+# primary. Under tests the replicas mirror the default test database.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(config("DB_REPLICA_HOSTS", default="", cast=Csv())):
+    host, _, port = replica.partition(":")
+    alias = f"replica{index + 1}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["voting_system.routers.ReplicaRouter"]
+
+# Seconds a client keeps reading from the primary after a write, so it
+# sees its own changes despite replication lag
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=5, cast=int)
+
+# Cache
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) so every
+# worker sees the same entries and invalidations.
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="voting-system"),
+    }
+}
+# Caches each process keeps to itself. The gunicorn modes (SERVER_MODE wsgi
+# or asgi, see entrypoint.sh) run several workers, which only see each
+# other's writes and invalidations through a shared cache.
+PER_PROCESS_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+MULTI_PROCESS = config("SERVER_MODE", default="dev") in ("wsgi", "asgi")
+
+# Auth change stamps (users.authentication.user_changed) are what revokes
+# the claims of tokens issued before a deactivation or demotion, so they
+# must outlive those tokens: they get a cache of their own, never shared
+# with payloads or throttle buckets. A Redis backend must not evict them.
+AUTH_CACHE_ALIAS = config("AUTH_CACHE_ALIAS", default="auth")
+AUTH_CACHE_BACKEND = config("AUTH_CACHE_BACKEND", default=CACHES["default"]["BACKEND"])
+CACHES["auth"] = {
+    "BACKEND": AUTH_CACHE_BACKEND,
+    "LOCATION": config(
+        "AUTH_CACHE_LOCATION",
+        default=(
+            "voting-system-auth"
+            if AUTH_CACHE_BACKEND in PER_PROCESS_CACHES
+            else CACHES["default"]["LOCATION"]
+        ),
+    ),
+}
+if AUTH_CACHE_BACKEND in PER_PROCESS_CACHES:
+    # Local memory culls entries past MAX_ENTRIES (300 by default)
+    CACHES["auth"]["OPTIONS"] = {"MAX_ENTRIES": 2**31}
+
+# Rate limits: token buckets in the THROTTLE_CACHE_ALIAS cache, written as
+# "<requests>/<s|min|h|day>". An empty value disables a limit.
+THROTTLE_CACHE_ALIAS = config("THROTTLE_CACHE_ALIAS", default="default")
+THROTTLE_RATES = {
+    # Logins per client address, and per CPF whatever the address
+    "login_ip": config("THROTTLE_LOGIN_IP", default="30/min"),
+    "login_cpf": config("THROTTLE_LOGIN_CPF", default="5/min"),
+    "register_ip": config("THROTTLE_REGISTER_IP", default="10/min"),
+    "vote_user": config("THROTTLE_VOTE_USER", default="30/min"),
+}
+
+# Admission control: requests running at once per worker process before
+# new ones are refused with 429 (0 disables), and their Retry-After
+ADMISSION_MAX_CONCURRENCY = config("ADMISSION_MAX_CONCURRENCY", default=0, cast=int)
+ADMISSION_RETRY_AFTER = config("ADMISSION_RETRY_AFTER", default=1, cast=int)
+
+# Idempotency-Key support on POST /topics and POST /topics/{id}/vote:
+# how long a response is replayed for its key, and how long a request
+# holding a key may run before a retry is let through
+IDEMPOTENCY_CACHE_ALIAS = config("IDEMPOTENCY_CACHE_ALIAS", default="default")
+IDEMPOTENCY_KEY_TTL = config("IDEMPOTENCY_KEY_TTL", default=86400, cast=int)
+IDEMPOTENCY_LOCK_TIMEOUT = config("IDEMPOTENCY_LOCK_TIMEOUT", default=30, cast=int)
+# A retry may land on another worker: stored responses and locks must be
+# seen by all of them
+if MULTI_PROCESS and CACHES[IDEMPOTENCY_CACHE_ALIAS]["BACKEND"] in PER_PROCESS_CACHES:
+    raise ImproperlyConfigured(
+        "IDEMPOTENCY_CACHE_ALIAS must name a shared cache (e.g. Redis, see "
+        "CACHE_BACKEND) when SERVER_MODE runs several workers."
+    )
+
+# Topic detail/result payload cache. The timeout bounds staleness for
+# WAITING/OPEN topics; CLOSED topics are cached with no expiry.
+TOPIC_CACHE_ALIAS = config("TOPIC_CACHE_ALIAS", default="default")
+TOPIC_CACHE_TIMEOUT = config("TOPIC_CACHE_TIMEOUT", default=5, cast=int)
+
+# Request instrumentation: Server-Timing header and structured log line
+# with query count, DB, view and render time for a sample of requests
+SERVER_TIMING_ENABLED = config("SERVER_TIMING_ENABLED", default=False, cast=bool)
+SERVER_TIMING_SAMPLE_RATE = config("SERVER_TIMING_SAMPLE_RATE", default=0.1, cast=float)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "voting_system.timing": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
+# Password hashing. The first hasher hashes new passwords, the others only
+# verify existing hashes, which are upgraded on login
+PASSWORD_HASHERS = config(
+    "PASSWORD_HASHERS",
+    default=(
+        "users.hashers.PBKDF2PasswordHasher,"
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher,"
+        "django.contrib.auth.hashers.Argon2PasswordHasher,"
+        "django.contrib.auth.hashers.BCryptSHA256PasswordHasher,"
+        "django.contrib.auth.hashers.ScryptPasswordHasher"
+    ),
+    cast=lambda value: [path.strip() for path in value.split(",")],
+)
+PASSWORD_HASH_ITERATIONS = config("PASSWORD_HASH_ITERATIONS", default=600000, cast=int)
+PASSWORD_HASH_WORKERS = config(
+    "PASSWORD_HASH_WORKERS", default=os.cpu_count() or 1, cast=int
+)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,9 +250,7 @@ AUTH_USER_MODEL = "users.User"
 
 # REST Framework
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("users.authentication.CachedJWTAuthentication",),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
@@ -119,6 +259,9 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
+    # Reverse proxies in front of the app; the throttles key clients by the
+    # address this many hops back in X-Forwarded-For (0: the socket address)
+    "NUM_PROXIES": config("NUM_PROXIES", default=0, cast=int),
 }
 
 # JWT Settings
@@ -129,6 +272,25 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": True,
 }
 
+# Trust the user claims in tokens (and the in-process user cache) instead
+# of loading the user row. Deactivation and privilege changes reach the
+# other workers through the AUTH_CACHE_ALIAS cache, so with several workers
+# this is only on by default when that cache is shared.
+AUTH_TRUST_TOKEN_CLAIMS = config(
+    "AUTH_TRUST_TOKEN_CLAIMS",
+    default=not MULTI_PROCESS or AUTH_CACHE_BACKEND not in PER_PROCESS_CACHES,
+    cast=bool,
+)
+if AUTH_TRUST_TOKEN_CLAIMS and AUTH_CACHE_ALIAS not in CACHES:
+    raise ImproperlyConfigured(
+        "AUTH_TRUST_TOKEN_CLAIMS needs AUTH_CACHE_ALIAS to name a configured "
+        "cache for the auth change stamps."
+    )
+AUTH_USER_CACHE_SIZE = config("AUTH_USER_CACHE_SIZE", default=10000, cast=int)
+AUTH_USER_CACHE_TTL = config("AUTH_USER_CACHE_TTL", default=60, cast=int)
+# Change stamps must outlive every access token issued before the change
+AUTH_USER_STAMP_TIMEOUT = int(SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"].total_seconds())
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -136,5 +298,44 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+# Browsers may send the key that makes vote and topic POSTs safe to retry
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+# Lets the frontend read when to retry a rate-limited or shed request
+CORS_EXPOSE_HEADERS = ["Retry-After"]
 
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Only in development
+
+# Voting sessions
+# Seconds between runs of the close_expired_sessions scheduler. Topic status
+# lags the real session end by at most this long; is_session_active is
+# always computed from the clock.
+SESSION_EXPIRY_TICK = config("SESSION_EXPIRY_TICK", default=30, cast=int)
+
+# Write-behind vote buffer: votes are acknowledged once queued in
+# PendingVote and moved to Vote in batches by flush_vote_buffer
+VOTE_BUFFER_ENABLED = config("VOTE_BUFFER_ENABLED", default=False, cast=bool)
+VOTE_BUFFER_FLUSH_INTERVAL = config(
+    "VOTE_BUFFER_FLUSH_INTERVAL", default=1.0, cast=float
+)
+VOTE_BUFFER_BATCH_SIZE = config("VOTE_BUFFER_BATCH_SIZE", default=1000, cast=int)
+
+# Default number of counter rows per option for new topics' tallies.
+# More shards mean less lock contention between concurrent votes.
+TALLY_SHARDS = config("TALLY_SHARDS", default=8, cast=int)
+
+# Rows fetched per round trip when streaming a topic's votes for audit
+VOTE_EXPORT_CHUNK_SIZE = config("VOTE_EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# Largest number of records accepted by POST /votes/batch
+VOTE_BATCH_MAX_SIZE = config("VOTE_BATCH_MAX_SIZE", default=5000, cast=int)
+
+# Live results (Server-Sent Events, served through the ASGI entry point)
+LIVE_RESULTS_POLL_INTERVAL = config(
+    "LIVE_RESULTS_POLL_INTERVAL", default=1.0, cast=float
+)
+LIVE_RESULTS_KEEPALIVE = config("LIVE_RESULTS_KEEPALIVE", default=15, cast=int)
+LIVE_RESULTS_MAX_STREAM_SECONDS = config(
+    "LIVE_RESULTS_MAX_STREAM_SECONDS", default=900, cast=int
+)
+LIVE_RESULTS_RETRY_MS = config("LIVE_RESULTS_RETRY_MS", default=3000, cast=int)
+LIVE_RESULTS_QUEUE_SIZE = 100
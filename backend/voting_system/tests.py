@@ -0,0 +1,353 @@
+import hashlib
+import json
+from django.core.exceptions import MiddlewareNotUsed
+from unittest import skipUnless
+from django.conf import settings
+from django.db import connection, connections, router
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from topics.models import Topic
+from . import metrics
+from .instrumentation import install
+from .middleware import ConcurrencyLimitMiddleware, ReplicaRoutingMiddleware
+from .routers import pin_if_sticky, replica_reads, stick_user
+from .throttling import TokenBucket, parse_rate
+
+User = get_user_model()
+
+
+class ServerTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        Topic.objects.create(title="Pauta", description="desc", created_by=self.user)
+        # The test database connection was opened before the middleware
+        # module was imported, so it missed the connection_created hook
+        install(connection)
+
+    @override_settings(SERVER_TIMING_ENABLED=True, SERVER_TIMING_SAMPLE_RATE=1.0)
+    def test_header_and_log_line(self):
+        with self.assertLogs("voting_system.timing", level="INFO") as logs:
+            response = APIClient().get("/topics")
+
+        header = response["Server-Timing"]
+        for metric in ("db;dur=", "view;dur=", "render;dur=", "serialize;dur="):
+            self.assertIn(metric, header)
+        self.assertIn('desc="1 queries"', header)  # the listing page
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], "/topics")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["queries"], 1)
+        self.assertIn("total_ms", record)
+
+    @override_settings(SERVER_TIMING_ENABLED=True, SERVER_TIMING_SAMPLE_RATE=0.0)
+    def test_unsampled_request_has_no_header(self):
+        response = APIClient().get("/topics")
+        self.assertNotIn("Server-Timing", response)
+
+    def test_disabled_by_default(self):
+        response = APIClient().get("/topics")
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(SERVER_TIMING_ENABLED=True, SERVER_TIMING_SAMPLE_RATE=1.0)
+    async def test_async_view_queries_are_counted(self):
+        topic = await Topic.objects.afirst()
+        with self.assertLogs("voting_system.timing", level="INFO") as logs:
+            await self.async_client.get(f"/topics/{topic.id}/live")
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["queries"], 1)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(self.view)
+
+    def view(self, request):
+        # Only asks the router, no query is sent to the replica alias
+        self.read_db = router.db_for_read(Topic)
+        return HttpResponse()
+
+    def test_safe_requests_read_from_replica(self):
+        self.middleware(self.factory.get("/topics"))
+        self.assertEqual(self.read_db, "replica1")
+        self.assertEqual(router.db_for_write(Topic), "default")
+
+    @override_settings(DATABASE_REPLICAS=[f"replica{i}" for i in range(10)])
+    def test_one_replica_per_request(self):
+        with replica_reads():
+            replicas = {router.db_for_read(Topic) for _ in range(20)}
+        self.assertEqual(len(replicas), 1)
+
+    def test_write_pins_client_to_primary(self):
+        response = self.middleware(self.factory.post("/topics/1/vote"))
+        self.assertEqual(self.read_db, "default")
+        cookie = response.cookies[ReplicaRoutingMiddleware.cookie_name]
+
+        request = self.factory.get("/topics/1/result")
+        request.COOKIES[cookie.key] = cookie.value
+        self.middleware(request)
+        self.assertEqual(self.read_db, "default")
+
+    def test_recent_writer_pinned_by_user(self):
+        stick_user(42)
+        with replica_reads():
+            pin_if_sticky(7)
+            self.assertEqual(router.db_for_read(Topic), "replica1")
+            pin_if_sticky(42)
+            self.assertEqual(router.db_for_read(Topic), "default")
+
+    def test_commands_and_tests_use_primary(self):
+        self.assertEqual(router.db_for_read(Topic), "default")
+        self.assertFalse(router.allow_migrate("replica1", "topics"))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_disabled_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaRoutingMiddleware(self.view)
+
+
+class RateLimitTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+
+    def login(
+        self, cpf="123.456.789-01", password="wrong", address="10.0.0.1", **extra
+    ):
+        return self.client.post(
+            "/login", {"cpf": cpf, "password": password}, REMOTE_ADDR=address, **extra
+        )
+
+    @override_settings(THROTTLE_RATES={"login_cpf": "2/min"})
+    def test_login_limited_per_cpf_across_addresses(self):
+        self.assertEqual(self.login(address="10.0.0.1").status_code, 400)
+        self.assertEqual(self.login(address="10.0.0.2").status_code, 400)
+        response = self.login(cpf="12345678901", address="10.0.0.3")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(metrics.snapshot()["throttle.login_cpf.rejected"], 1)
+        # Other members are not affected
+        self.assertEqual(self.login(cpf="98765432100").status_code, 400)
+
+    @override_settings(THROTTLE_RATES={"login_ip": "1/min"})
+    def test_browser_can_read_rate_limit(self):
+        self.login()
+        response = self.login(HTTP_ORIGIN="http://localhost:3000")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(
+            response["Access-Control-Allow-Origin"], "http://localhost:3000"
+        )
+        self.assertIn("Retry-After", response["Access-Control-Expose-Headers"])
+
+    @override_settings(THROTTLE_RATES={"login_ip": "1/min"})
+    def test_login_limited_per_address(self):
+        self.assertEqual(self.login(address="10.0.0.1").status_code, 400)
+        self.assertEqual(self.login(address="10.0.0.1").status_code, 429)
+        self.assertEqual(self.login(address="10.0.0.2").status_code, 400)
+
+    @override_settings(THROTTLE_RATES={"vote_user": "1/min"})
+    def test_votes_limited_per_user(self):
+        topic = Topic.objects.create(
+            title="Pauta", description="desc", created_by=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(
+            self.client.post(f"/topics/{topic.id}/vote", {"vote": "YES"}).status_code,
+            400,
+        )
+        self.assertEqual(
+            self.client.post(f"/topics/{topic.id}/vote", {"vote": "YES"}).status_code,
+            429,
+        )
+
+    def test_bucket_refills(self):
+        bucket = TokenBucket("throttle:test", *parse_rate("2/s"))
+        self.assertEqual(bucket.consume(), 0)
+        self.assertEqual(bucket.consume(), 0)
+        wait = bucket.consume()
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 0.5)
+
+
+class IdempotencyKeyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        self.topic = Topic.objects.create(
+            title="Pauta",
+            description="desc",
+            created_by=self.user,
+            status="OPEN",
+            session_started_at=timezone.now(),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def vote(self, key, choice="YES"):
+        return self.client.post(
+            f"/topics/{self.topic.id}/vote",
+            {"vote": choice},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_vote_retry_replays_original_response(self):
+        first = self.vote("abc")
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(0):
+            retry = self.vote("abc")
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+
+        # A new key runs the view: the duplicate vote is refused as before
+        self.assertEqual(self.vote("def").status_code, 400)
+
+    def test_key_reused_with_another_body(self):
+        self.vote("abc")
+        response = self.vote("abc", choice="NO")
+        self.assertEqual(response.status_code, 422)
+
+    def test_topic_creation_is_not_duplicated(self):
+        data = {"title": "Nova Pauta", "description": "Desc"}
+        first = self.client.post(
+            "/topics", data, format="json", HTTP_IDEMPOTENCY_KEY="create-1"
+        )
+        retry = self.client.post(
+            "/topics", data, format="json", HTTP_IDEMPOTENCY_KEY="create-1"
+        )
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Topic.objects.filter(title="Nova Pauta").count(), 1)
+
+    def test_keys_are_per_user(self):
+        self.vote("abc")
+        other = User.objects.create_user(
+            cpf="98765432100",
+            name="Other User",
+            email="other@example.com",
+            password="otherpass123",
+        )
+        self.client.force_authenticate(user=other)
+        response = self.vote("abc")
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(response.status_code, 201)
+
+    def test_request_in_progress_conflicts(self):
+        digest = hashlib.sha256(b"abc").hexdigest()
+        path = f"/topics/{self.topic.id}/vote"
+        cache.set(f"idempotency:{self.user.pk}:{path}:{digest}:lock", 1)
+        self.assertEqual(self.vote("abc").status_code, 409)
+
+
+class ConcurrencyLimitTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    @override_settings(ADMISSION_MAX_CONCURRENCY=1, ADMISSION_RETRY_AFTER=2)
+    def test_requests_over_the_limit_are_shed(self):
+        inner = []
+
+        def view(request):
+            # A second request arriving while this one runs
+            inner.append(middleware(RequestFactory().get("/topics")))
+            return HttpResponse("ok")
+
+        middleware = ConcurrencyLimitMiddleware(view)
+        response = middleware(RequestFactory().get("/topics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(inner[0].status_code, 429)
+        self.assertEqual(inner[0]["Retry-After"], "2")
+        self.assertEqual(metrics.snapshot()["admission.rejected"], 1)
+
+        # The slot is released once the response is returned
+        self.assertEqual(middleware(RequestFactory().get("/")).status_code, 200)
+
+    def test_disabled_by_default(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ConcurrencyLimitMiddleware(lambda request: HttpResponse())
+
+    def test_sheds_below_cors(self):
+        # Shed responses still get their CORS headers on the way out
+        middleware = settings.MIDDLEWARE
+        self.assertLess(
+            middleware.index("corsheaders.middleware.CorsMiddleware"),
+            middleware.index("voting_system.middleware.ConcurrencyLimitMiddleware"),
+        )
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "needs DB_REPLICA_HOSTS")
+class ReplicaEndToEndTest(TransactionTestCase):
+    # Replicas mirror the default test database, so they see committed rows
+    databases = "__all__"
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            cpf="12345678901",
+            name="Test User",
+            email="test@example.com",
+            password="testpass123",
+        )
+        Topic.objects.create(title="Pauta", description="desc", created_by=self.user)
+        self.client = APIClient()
+
+    def read_queries(self, path):
+        """Queries run by a GET on the primary and on the replicas."""
+        captures = {
+            alias: CaptureQueriesContext(connections[alias])
+            for alias in ["default", *settings.DATABASE_REPLICAS]
+        }
+        for capture in captures.values():
+            capture.__enter__()
+        try:
+            response = self.client.get(path)
+        finally:
+            for capture in captures.values():
+                capture.__exit__(None, None, None)
+        self.assertEqual(response.status_code, 200)
+        primary = len(captures.pop("default"))
+        return primary, sum(len(capture) for capture in captures.values())
+
+    def test_reads_go_to_replica_until_a_write(self):
+        primary, replica = self.read_queries("/topics")
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+        self.client.force_authenticate(user=self.user)
+        self.client.post("/topics", {"title": "Nova", "description": "d"})
+        primary, replica = self.read_queries("/topics")
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
@@ -0,0 +1,104 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+from users.cpf import cpf_digits
+from . import metrics
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """``"5/min"`` -> ``(5, 60)``: bucket capacity and refill period in seconds."""
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+class TokenBucket:
+    """
+    Token bucket kept in the shared cache: holds up to ``capacity`` tokens,
+    refilled evenly over ``period`` seconds, one token per request.
+
+    The read-modify-write is not atomic, so concurrent requests may
+    overspend by a token or two; that is enough to stop bursts without a
+    lock round-trip.
+    """
+
+    def __init__(self, key, capacity, period):
+        self.cache = caches[settings.THROTTLE_CACHE_ALIAS]
+        self.key = key
+        self.capacity = capacity
+        self.period = period
+        self.refill = capacity / period
+
+    def consume(self):
+        """Takes a token. Returns 0, or the seconds until one is available."""
+        now = time.time()
+        tokens, updated_at = self.cache.get(self.key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated_at) * self.refill)
+        if tokens < 1:
+            return (1 - tokens) / self.refill
+        self.cache.set(self.key, (tokens - 1, now), self.period)
+        return 0
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    DRF throttle over a TokenBucket per ``scope`` and client key, with its
+    rate in THROTTLE_RATES; scopes without a rate are not throttled.
+    Rejections are counted in the ``throttle.<scope>.rejected`` metric.
+    """
+
+    scope = None
+
+    def get_key(self, request):
+        """What the bucket is kept per; None skips throttling."""
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        rate = settings.THROTTLE_RATES.get(self.scope)
+        key = self.get_key(request) if rate else None
+        if key is None:
+            return True
+
+        bucket = TokenBucket(f"throttle:{self.scope}:{key}", *parse_rate(rate))
+        self.retry_after = bucket.consume()
+        if self.retry_after:
+            metrics.incr(f"throttle.{self.scope}.rejected")
+            return False
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPThrottle(BucketThrottle):
+    def get_key(self, request):
+        # Honors X-Forwarded-For up to NUM_PROXIES, like DRF's throttles
+        return self.get_ident(request)
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = "login_ip"
+
+
+class RegisterIPThrottle(IPThrottle):
+    scope = "register_ip"
+
+
+class LoginCPFThrottle(BucketThrottle):
+    # Password guessing against one member, whatever the client's address
+    scope = "login_cpf"
+
+    def get_key(self, request):
+        cpf = request.data.get("cpf") if isinstance(request.data, dict) else None
+        if not isinstance(cpf, str):
+            return None
+        return cpf_digits(cpf) or None
+
+
+class VoteUserThrottle(BucketThrottle):
+    scope = "vote_user"
+
+    def get_key(self, request):
+        return request.user.pk if request.user.is_authenticated else None
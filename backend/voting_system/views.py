@@ -0,0 +1,16 @@
+from django.conf import settings
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from votes.buffer import buffer_stats
+from . import metrics
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    # Counters of the worker process that served this request
+    data = metrics.snapshot()
+    if settings.VOTE_BUFFER_ENABLED:
+        data.update(buffer_stats())
+    return Response(data)
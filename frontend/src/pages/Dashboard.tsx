@@ -2,14 +2,14 @@
 import React, { useEffect, useState } from 'react';
 import { useDispatch, useSelector } from 'react-redux';
 import { AppDispatch, RootState } from '../store';
-import { fetchTopics, openSession, createTopic } from '../store/votingSlice';
+import { fetchTopics, fetchMoreTopics, openSession, createTopic } from '../store/votingSlice';
 import TopicCard from '../components/TopicCard';
 import { useToast } from '../hooks/use-toast';
 import { Button } from '../components/ui/button';
 
 const Dashboard: React.FC = () => {
   const dispatch = useDispatch<AppDispatch>();
-  const { topics, isLoading, error } = useSelector((state: RootState) => state.voting);
+  const { topics, nextCursor, isLoading, isLoadingMore, error } = useSelector((state: RootState) => state.voting);
   const isAuthenticated = useSelector((state: RootState) => state.auth.isAuthenticated);
   const [showModal, setShowModal] = useState(false);
   const [title, setTitle] = useState('');
@@ -148,6 +148,18 @@ const Dashboard: React.FC = () => {
           ))}
         </div>
       )}
+
+      {nextCursor && (
+        <div className="flex justify-center">
+          <Button
+            variant="outline"
+            onClick={() => dispatch(fetchMoreTopics())}
+            disabled={isLoadingMore}
+          >
+            {isLoadingMore ? 'Carregando...' : 'Carregar mais pautas'}
+          </Button>
+        </div>
+      )}
     </div>
   );
 };
@@ -3,7 +3,8 @@ import React, { useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useDispatch, useSelector } from 'react-redux';
 import { AppDispatch, RootState } from '../store';
-import { fetchTopicById, fetchVoteResult, clearCurrentTopic } from '../store/votingSlice';
+import { fetchTopicById, fetchVoteResult, clearCurrentTopic, liveResultReceived } from '../store/votingSlice';
+import { watchResult } from '../services/votingService';
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
@@ -17,11 +18,27 @@ const Results: React.FC = () => {
   const { voteResult, isLoading } = useSelector((state: RootState) => state.voting);
 
   useEffect(() => {
+    let source: EventSource | null = null;
+
     if (topicId) {
       dispatch(fetchVoteResult(topicId));
+
+      // Live tally and status updates pushed by the server
+      source = watchResult(topicId);
+      const onUpdate = (event: MessageEvent) => {
+        const update = JSON.parse(event.data);
+        dispatch(liveResultReceived(update));
+        if (update.topic_status === 'CLOSED') {
+          source?.close();
+        }
+      };
+      source.addEventListener('snapshot', onUpdate);
+      source.addEventListener('tally', onUpdate);
+      source.addEventListener('status', onUpdate);
     }
 
     return () => {
+      source?.close();
       dispatch(clearCurrentTopic());
     };
   }, [dispatch, topicId]);
@@ -1,8 +1,13 @@
 
-import { apiRequest } from './api';
+import { API_BASE_URL, apiRequest } from './api';
 
-export const getTopics = async () => {
-  return await apiRequest('/topics');
+// The listing is paginated by cursor: returns one page and the cursor of the next
+export const getTopics = async (cursor?: string | null) => {
+  const page = await apiRequest(
+    cursor ? `/topics?cursor=${encodeURIComponent(cursor)}` : '/topics'
+  );
+  const nextCursor = page.next ? new URL(page.next).searchParams.get('cursor') : null;
+  return { results: page.results, nextCursor };
 };
 
 export const getTopicById = async (topicId: string) => {
@@ -28,6 +33,10 @@ export const getResult = async (topicId: string) => {
   return await apiRequest(`/topics/${topicId}/result`);
 };
 
+export const watchResult = (topicId: string) => {
+  return new EventSource(`${API_BASE_URL}/topics/${topicId}/live`);
+};
+
 export const createTopic = async (title: string, description: string) => {
   return await apiRequest('/topics', {
     method: 'POST',
@@ -20,6 +20,8 @@ export interface VoteResult {
 
 interface VotingState {
   topics: Topic[];
+  nextCursor: string | null;
+  isLoadingMore: boolean;
   currentTopic: Topic | null;
   voteResult: VoteResult | null;
   isLoading: boolean;
@@ -28,6 +30,8 @@ interface VotingState {
 
 const initialState: VotingState = {
   topics: [],
+  nextCursor: null,
+  isLoadingMore: false,
   currentTopic: null,
   voteResult: null,
   isLoading: false,
@@ -41,6 +45,14 @@ export const fetchTopics = createAsyncThunk(
   }
 );
 
+export const fetchMoreTopics = createAsyncThunk(
+  'voting/fetchMoreTopics',
+  async (_: void, { getState }) => {
+    const { voting } = getState() as { voting: VotingState };
+    return await votingService.getTopics(voting.nextCursor);
+  }
+);
+
 export const fetchTopicById = createAsyncThunk(
   'voting/fetchTopicById',
   async (topicId: string) => {
@@ -86,6 +98,17 @@ const votingSlice = createSlice({
     clearCurrentTopic: (state) => {
       state.currentTopic = null;
     },
+    liveResultReceived: (state, action) => {
+      if (state.voteResult && state.voteResult.topic_id === action.payload.topic_id) {
+        state.voteResult = {
+          ...state.voteResult,
+          topic_status: action.payload.topic_status,
+          total_votes: action.payload.total_votes,
+          yes_votes: action.payload.yes_votes,
+          no_votes: action.payload.no_votes,
+        };
+      }
+    },
   },
   extraReducers: (builder) => {
     builder
@@ -95,12 +118,28 @@ const votingSlice = createSlice({
       })
       .addCase(fetchTopics.fulfilled, (state, action) => {
         state.isLoading = false;
-        state.topics = action.payload;
+        state.topics = action.payload.results;
+        state.nextCursor = action.payload.nextCursor;
       })
       .addCase(fetchTopics.rejected, (state, action) => {
         state.isLoading = false;
         state.error = action.error.message || 'Erro ao carregar pautas';
       })
+      .addCase(fetchMoreTopics.pending, (state) => {
+        state.isLoadingMore = true;
+      })
+      .addCase(fetchMoreTopics.fulfilled, (state, action) => {
+        state.isLoadingMore = false;
+        const loaded = new Set(state.topics.map(topic => topic.id));
+        state.topics.push(
+          ...action.payload.results.filter((topic: Topic) => !loaded.has(topic.id))
+        );
+        state.nextCursor = action.payload.nextCursor;
+      })
+      .addCase(fetchMoreTopics.rejected, (state, action) => {
+        state.isLoadingMore = false;
+        state.error = action.error.message || 'Erro ao carregar pautas';
+      })
       .addCase(fetchTopicById.fulfilled, (state, action) => {
         state.currentTopic = action.payload;
       })
@@ -125,5 +164,5 @@ const votingSlice = createSlice({
   },
 });
 
-export const { clearError, clearCurrentTopic } = votingSlice.actions;
+export const { clearError, clearCurrentTopic, liveResultReceived } = votingSlice.actions;
 export default votingSlice.reducer;